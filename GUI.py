@@ -1,76 +1,296 @@
 import sys
+import os
+import codecs
+import select
+import signal
+import socket
+import time
 import paramiko
-import subprocess
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QTextEdit, QSplitter, QFrame, QGroupBox, QScrollArea,
+                             QPlainTextEdit, QSplitter, QFrame, QGroupBox,
                              QSplitterHandle)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QSettings, QTimer
+from PyQt5.QtCore import QObject, QProcess, QThread, pyqtSignal, Qt, QSettings, QTimer
 from PyQt5.QtGui import QColor, QPalette, QFont, QTextCursor
 
-class LocalCommandThread(QThread):
-    """Thread for executing local commands and capturing their output"""
+class LocalCommandRunner(QObject):
+    """Runs a local command with QProcess and forwards its output
+
+    stdout and stderr are merged and read by the event loop as they arrive,
+    so a chatty stderr can never fill its pipe and block the command. The
+    command runs in its own process group (setsid), and cancel() signals the
+    whole group, so children such as the nodes of ros2 launch end with it.
+    The command counts as running until its group is empty, also after bash,
+    the group leader, has exited.
+    """
     output_received = pyqtSignal(str, int)
+    command_finished = pyqtSignal(object)  # The runner, once its process group is empty
+    kill_timeout_ms = 2000  # Milliseconds between SIGTERM and SIGKILL on cancel
+    group_poll_ms = 200  # Milliseconds between checks of a group that outlived its leader
     
-    def __init__(self, command, terminal_id):
-        super().__init__()
+    def __init__(self, command, terminal_id, parent=None):
+        super().__init__(parent)
         self.command = command
         self.terminal_id = terminal_id
-        
-    def run(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')  # Keeps characters split across reads
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.MergedChannels)
+        self.process.readyReadStandardOutput.connect(self.read_output)
+        self.process.started.connect(self.handle_started)
+        self.process.finished.connect(self.handle_finished)
+        self.process.errorOccurred.connect(self.handle_error)
+        self.pgid = None  # Process group of the command, the pid of its leader
+        self.killed = False  # SIGKILL was sent to the group
+        self._kill_timer = QTimer(self)
+        self._kill_timer.setSingleShot(True)
+        self._kill_timer.timeout.connect(self.kill_group)
+        self._group_timer = QTimer(self)
+        self._group_timer.setSingleShot(True)
+        self._group_timer.timeout.connect(self.wait_for_group)
+        
+    def start(self):
+        """Start the command in a new session, the group leader is the bash process"""
+        self.process.start('setsid', ['/bin/bash', '-c', self.command])  # Explicitly use bash for shell features
+    
+    def handle_started(self):
+        self.pgid = self.process.processId()  # setsid keeps the pid, which becomes the group id
+    
+    def group_alive(self):
+        """Return True while any process of the command's group exists"""
+        pgid = self.pgid or self.process.processId()
+        if pgid <= 0:
+            return False
         try:
-            # Create subprocess with pipes for stdout/stderr
-            process = subprocess.Popen(
-                self.command, 
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                executable='/bin/bash'  # Explicitly use bash for shell features
-            )
-            
-            # Read output line by line as it becomes available
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.output_received.emit(output.strip(), self.terminal_id)
-            
-            # Capture any remaining output after process completes
-            remaining_output, errors = process.communicate()
-            if remaining_output:
-                self.output_received.emit(remaining_output.strip(), self.terminal_id)
-            if errors:
-                self.output_received.emit(f"Error: {errors.strip()}", self.terminal_id)
-                
-        except Exception as e:
-            self.output_received.emit(f"Command execution failed: {str(e)}", self.terminal_id)
+            os.killpg(pgid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:  # Only processes of another user are left, e.g. sudo
+            return True
+        return True
+    
+    def is_running(self):
+        return self.process.state() != QProcess.NotRunning or self.group_alive()
+    
+    def read_output(self):
+        """Forward everything the command has written so far"""
+        text = self._decoder.decode(bytes(self.process.readAllStandardOutput()))
+        if text:
+            self.output_received.emit(text, self.terminal_id)
+    
+    def handle_finished(self, exit_code, exit_status):
+        self.read_output()
+        text = self._decoder.decode(b'', final=True)
+        if exit_status == QProcess.CrashExit:
+            text += f"\n[{self.command}: terminated]\n"
+        elif exit_code:
+            text += f"\n[{self.command}: exit code {exit_code}]\n"
+        if text:
+            self.output_received.emit(text, self.terminal_id)
+        self.wait_for_group()
+    
+    def wait_for_group(self):
+        """Report the command as finished once the last process of its group has ended"""
+        if self.group_alive() and not self.killed:  # After SIGKILL only zombies can be left for their reaper
+            self._group_timer.start(self.group_poll_ms)  # Children outlived bash
+            return
+        self._kill_timer.stop()
+        self.command_finished.emit(self)
+    
+    def handle_error(self, error):
+        if error == QProcess.FailedToStart:  # No finished signal follows
+            self.output_received.emit(f"Command execution failed: {self.process.errorString()}\n", self.terminal_id)
+            self.command_finished.emit(self)
+    
+    def cancel(self):
+        """Terminate the process group of the command, kill it if it does not end in time"""
+        if not self.is_running():
+            return
+        self.signal_group(signal.SIGTERM)
+        self._kill_timer.start(self.kill_timeout_ms)
+    
+    def kill_group(self):
+        """Kill what is left of the group, whether or not its leader is still alive"""
+        if self.group_alive():
+            self.signal_group(signal.SIGKILL)
+            self.killed = True
+    
+    def signal_group(self, signum):
+        pgid = self.pgid or self.process.processId()
+        if pgid <= 0:
+            return
+        try:
+            os.killpg(pgid, signum)
+        except ProcessLookupError:  # setsid has not run yet, signal the process alone
+            try:
+                os.kill(pgid, signum)
+            except ProcessLookupError:
+                pass
+        except PermissionError:  # Processes of another user, e.g. sudo
+            pass
 
 class SSHOutputThread(QThread):
-    """Thread for continuously reading SSH shell output"""
+    """Thread for continuously reading SSH shell output
+
+    The thread sleeps in select() until the channel has data and then drains
+    everything available. Output arriving within one UI frame of the last
+    signal is held back and sent with the rest of the frame, so a fast stream
+    costs one repaint per frame instead of one per read, while a single
+    keystroke echo is sent right away.
+    """
     output_received = pyqtSignal(str, int)
+    closed = pyqtSignal(int)  # The remote side closed the channel
+    frame_interval = 1 / 30  # Seconds between output signals of a continuous stream
+    read_size = 65536  # Bytes per recv() call
+    max_drain = 1 << 20  # Bytes read before the output is sent, even if more is available
     
     def __init__(self, ssh_shell, connection_id):
         super().__init__()
         self.ssh_shell = ssh_shell
         self.connection_id = connection_id
-        self._running = True
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')  # Keeps characters split across reads
+        self._wakeup_r, self._wakeup_w = os.pipe()  # Interrupts select() on stop()
         
     def run(self):
-        while self._running:
-            if self.ssh_shell.recv_ready():
-                try:
-                    # Read data from SSH channel with error handling for decoding
-                    data = self.ssh_shell.recv(4096).decode('utf-8', errors='replace')
-                    self.output_received.emit(data, self.connection_id)
-                except Exception as e:
-                    self.output_received.emit(f"\nDecode error: {str(e)}\n", self.connection_id)
-            QThread.msleep(50)  # Small delay to prevent CPU overuse
+        pending = []
+        last_emit = 0.0
+        closed = False
+        try:
+            while True:
+                timeout = None  # Wait for data as long as nothing is held back
+                if pending:
+                    timeout = max(0.0, last_emit + self.frame_interval - time.monotonic())
+                readable, _, _ = select.select([self.ssh_shell, self._wakeup_r], [], [], timeout)
+                if self._wakeup_r in readable:
+                    break
+                if readable:
+                    text, eof = self.drain()
+                    if text:
+                        pending.append(text)
+                    if eof:
+                        closed = True
+                        break
+                if pending and time.monotonic() - last_emit >= self.frame_interval:
+                    self.output_received.emit(''.join(pending), self.connection_id)
+                    pending = []
+                    last_emit = time.monotonic()
+        except (OSError, paramiko.SSHException) as e:
+            pending.append(f"\nSSH read error: {str(e)}\n")
+            closed = True
+        if pending:
+            self.output_received.emit(''.join(pending), self.connection_id)
+        if closed:
+            self.closed.emit(self.connection_id)
+    
+    def drain(self):
+        """Read all data available on the channel, return its text and whether the channel was closed"""
+        chunks = []
+        size = 0
+        eof = False
+        while size < self.max_drain:
+            try:
+                data = self.ssh_shell.recv(self.read_size)
+            except socket.timeout:  # Woken up without data
+                break
+            if not data:
+                eof = True
+                break
+            chunks.append(data)
+            size += len(data)
+            if not self.ssh_shell.recv_ready():
+                break
+        return self._decoder.decode(b''.join(chunks), final=eof), eof
             
     def stop(self):
-        """Signal the thread to stop running"""
-        self._running = False
+        """Stop the thread and wait for it to end"""
+        if self._wakeup_w is None:
+            return
+        if self.isRunning():
+            os.write(self._wakeup_w, b'\0')
+            self.wait()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        self._wakeup_r = self._wakeup_w = None
+
+class TerminalOutput(QPlainTextEdit):
+    """Read-only terminal output with a bounded scrollback
+
+    Appended text is collected and written to the document by a timer at a
+    fixed UI rate, so a fast stream costs one layout per flush instead of one
+    per chunk. The document keeps the last max_lines lines. While paused,
+    output is only counted, not rendered.
+    """
+    counted = pyqtSignal(int, int)  # Bytes received and bytes skipped while paused, sent once per flush
+    max_lines = 5000  # Lines kept in the scrollback
+    flush_interval_ms = 50  # Milliseconds between writes to the document
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setFont(QFont("Courier New", 10))  # Monospace font for terminal output
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)  # Important for terminal output
+        self.setMaximumBlockCount(self.max_lines)  # Older lines are dropped from the top
+        
+        # Set dark theme colors
+        palette = self.palette()
+        palette.setColor(QPalette.Base, QColor(25, 25, 25))  # Dark background
+        palette.setColor(QPalette.Text, QColor(240, 240, 240))  # Light text
+        self.setPalette(palette)
+        
+        self.paused = False
+        self.received = 0
+        self.skipped = 0
+        self._pending = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)  # Only runs while output is pending
+        self._flush_timer.timeout.connect(self.flush)
+    
+    def append_text(self, text):
+        """Queue text for the next flush"""
+        size = len(text.encode('utf-8', errors='replace'))
+        self.received += size
+        if self.paused:
+            self.skipped += size
+        else:
+            self._pending.append(text)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(self.flush_interval_ms)
+    
+    def flush(self):
+        """Write the pending text to the document in one edit"""
+        self.counted.emit(self.received, self.skipped)
+        if not self._pending:
+            return
+        text = ''.join(self._pending)
+        self._pending = []
+        if text.count('\n') > self.max_lines:  # Lines that would be dropped right away are not laid out
+            text = '\n'.join(text.split('\n')[-self.max_lines - 1:])
+        scrollbar = self.verticalScrollBar()
+        follow = scrollbar.value() == scrollbar.maximum()  # Keep the position if the user scrolled up
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
+    
+    def set_paused(self, paused):
+        """Stop or resume rendering; bytes are counted either way"""
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if paused:
+            self.flush()  # Show what arrived before the pause
+        elif self.skipped:
+            self._pending.append(f"\n[{format_size(self.skipped)} not shown while paused]\n")
+            self.skipped = 0
+            self.flush()
+
+def format_size(size):
+    """Format a byte count for the status labels"""
+    for unit in ('B', 'kB', 'MB'):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} GB"
 
 class LocalTerminalPanel(QFrame):
     """Panel for local terminal emulation with command input and output display"""
@@ -78,7 +298,7 @@ class LocalTerminalPanel(QFrame):
         super().__init__(parent)
         self.terminal_id = terminal_id
         self.parent = parent
-        self.command_thread = None
+        self.runners = []  # Commands still running, several may run at once
         self.initUI()
         
     def initUI(self):
@@ -92,31 +312,35 @@ class LocalTerminalPanel(QFrame):
         local_label.setFont(QFont("Arial", 10, QFont.Bold))
         header.addWidget(local_label)
         header.addStretch()
-        layout.addLayout(header)
-        
-        # Create scrollable output area
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
         
-        self.local_output = QTextEdit()
-        self.local_output.setReadOnly(True)
-        self.local_output.setFont(QFont("Courier New", 10))  # Monospace font for terminal output
-        self.local_output.setLineWrapMode(QTextEdit.NoWrap)  # Important for terminal output
-        
-        # Set dark theme colors
-        palette = self.local_output.palette()
-        palette.setColor(QPalette.Base, QColor(25, 25, 25))  # Dark background
-        palette.setColor(QPalette.Text, QColor(240, 240, 240))  # Light text
-        self.local_output.setPalette(palette)
+        # Output counter and pause button
+        self.output_status = QLabel()
+        self.output_status.setFont(QFont("Arial", 8))
+        header.addWidget(self.output_status)
+        self.pause_btn = QPushButton('Pause Output')
+        self.pause_btn.setFont(QFont("Arial", 9))
+        self.pause_btn.setCheckable(True)
+        header.addWidget(self.pause_btn)
+        layout.addLayout(header)
         
-        scroll_area.setWidget(self.local_output)
-        layout.addWidget(scroll_area)
+        # Output area with bounded scrollback
+        self.local_output = TerminalOutput()
+        self.local_output.counted.connect(self.update_output_status)
+        self.pause_btn.toggled.connect(self.local_output.set_paused)
+        layout.addWidget(self.local_output)
         
         self.init_local_quick_buttons(layout)
         
-        # Command input area
+        # Command input area with stop button
         cmd_layout = QHBoxLayout()
         
+        self.local_stop_btn = QPushButton('Stop')
+        self.local_stop_btn.setFont(QFont("Arial", 9))
+        self.local_stop_btn.setToolTip('Terminate all running commands of this terminal')
+        self.local_stop_btn.clicked.connect(self.stop_local_commands)
+        self.local_stop_btn.setEnabled(False)
+        cmd_layout.addWidget(self.local_stop_btn)
+        
         self.local_input = QLineEdit()
         self.local_input.setFont(QFont("Courier New", 10))
         self.local_input.setPlaceholderText('Enter command')
@@ -164,22 +388,57 @@ class LocalTerminalPanel(QFrame):
         layout.addWidget(quick_btn_group)
     
     def append_local_output(self, text):
-        """Append text to the output display with proper cursor handling"""
-        cursor = self.local_output.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        cursor.insertText(text + '\n')
-        self.local_output.setTextCursor(cursor)
-        self.local_output.ensureCursorVisible()  # Auto-scroll to bottom
+        """Append a line to the output display, rendered with the next flush"""
+        self.local_output.append_text(text + '\n')
+    
+    def append_command_output(self, text):
+        """Append command output as it was read, it carries its own newlines"""
+        self.local_output.append_text(text)
+    
+    def update_output_status(self, received, skipped):
+        """Show the received and, while paused, the hidden output"""
+        status = format_size(received)
+        if skipped:
+            status += f" ({format_size(skipped)} paused)"
+        self.output_status.setText(status)
     
     def execute_local_command(self, command):
-        """Execute a command in a separate thread and handle output"""
+        """Start a command next to the ones already running and show its output"""
         self.append_local_output(f"$ {command}")
-        if self.command_thread and self.command_thread.isRunning():
-            self.command_thread.terminate()  # Stop any running command
-        
-        self.command_thread = LocalCommandThread(command, self.terminal_id)
-        self.command_thread.output_received.connect(self.parent.handle_local_output)
-        self.command_thread.start()
+        runner = LocalCommandRunner(command, self.terminal_id, self)
+        runner.output_received.connect(self.parent.handle_local_output)
+        runner.command_finished.connect(self.handle_command_finished)
+        self.runners.append(runner)
+        self.update_stop_button()
+        runner.start()
+    
+    def handle_command_finished(self, runner):
+        """Forget a command that has ended"""
+        if runner in self.runners:
+            self.runners.remove(runner)
+            runner.deleteLater()
+        self.update_stop_button()
+    
+    def update_stop_button(self):
+        count = len(self.runners)
+        self.local_stop_btn.setEnabled(count > 0)
+        self.local_stop_btn.setText(f'Stop ({count})' if count > 1 else 'Stop')
+    
+    def stop_local_commands(self):
+        """Terminate the process groups of all running commands"""
+        for runner in self.runners:
+            runner.cancel()
+    
+    def shutdown(self, timeout_ms=1000):
+        """Terminate all commands and wait for their process groups, killing what is left"""
+        self.stop_local_commands()
+        deadline = time.monotonic() + timeout_ms / 1000
+        for runner in list(self.runners):
+            runner.process.waitForFinished(max(0, int((deadline - time.monotonic()) * 1000)))
+            while runner.group_alive() and time.monotonic() < deadline:
+                time.sleep(0.05)  # Children may outlive bash
+            runner.kill_group()
+            runner.process.waitForFinished(100)  # Reap a killed leader
     
     def run_local_command(self):
         """Run the command entered in the input field"""
@@ -228,6 +487,15 @@ class SSHConnectionPanel(QFrame):
         header.addWidget(self.status_light)
         header.addStretch()
         
+        # Output counter and pause button
+        self.output_status = QLabel()
+        self.output_status.setFont(QFont("Arial", 8))
+        header.addWidget(self.output_status)
+        self.pause_btn = QPushButton('Pause Output')
+        self.pause_btn.setFont(QFont("Arial", 9))
+        self.pause_btn.setCheckable(True)
+        header.addWidget(self.pause_btn)
+        
         self.connect_btn = QPushButton('Connect')
         self.connect_btn.setFont(QFont("Arial", 9))
         self.connect_btn.clicked.connect(self.toggle_connection)
@@ -235,23 +503,11 @@ class SSHConnectionPanel(QFrame):
         
         layout.addLayout(header)
         
-        # Scrollable output area
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        
-        self.output_area = QTextEdit()
-        self.output_area.setReadOnly(True)
-        self.output_area.setFont(QFont("Courier New", 10))  # Monospace font
-        self.output_area.setLineWrapMode(QTextEdit.NoWrap)  # Important for terminal
-        
-        # Set dark theme colors
-        palette = self.output_area.palette()
-        palette.setColor(QPalette.Base, QColor(25, 25, 25))  # Dark background
-        palette.setColor(QPalette.Text, QColor(240, 240, 240))  # Light text
-        self.output_area.setPalette(palette)
-        
-        scroll_area.setWidget(self.output_area)
-        layout.addWidget(scroll_area)
+        # Output area with bounded scrollback
+        self.output_area = TerminalOutput()
+        self.output_area.counted.connect(self.update_output_status)
+        self.pause_btn.toggled.connect(self.output_area.set_paused)
+        layout.addWidget(self.output_area)
         
         self.init_quick_buttons(layout)
         
@@ -351,18 +607,27 @@ class SSHConnectionPanel(QFrame):
                 self.append_output(f"Error sending Ctrl+C: {str(e)}")
     
     def append_output(self, text):
-        """Append text to the output display with proper cursor handling"""
-        cursor = self.output_area.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        cursor.insertText(text)
-        self.output_area.setTextCursor(cursor)
-        self.output_area.ensureCursorVisible()  # Auto-scroll to bottom
+        """Append text to the output display, rendered with the next flush"""
+        self.output_area.append_text(text)
+    
+    def update_output_status(self, received, skipped):
+        """Show the received and, while paused, the hidden output"""
+        status = format_size(received)
+        if skipped:
+            status += f" ({format_size(skipped)} paused)"
+        self.output_status.setText(status)
     
     def handle_output(self, data, connection_id):
         """Handle incoming data from SSH connection"""
         if connection_id == self.connection_id:
             self.append_output(data)
     
+    def handle_closed(self, connection_id):
+        """Update the UI when the remote side closed the connection"""
+        if connection_id == self.connection_id and self.connected:
+            self.append_output("\nConnection closed by remote host\n")
+            self.disconnect_ssh()
+    
     def send_command(self, command):
         """Send command to SSH shell"""
         if not self.connected or not self.ssh_shell:
@@ -431,11 +696,12 @@ class SSHConnectionPanel(QFrame):
             
             # Create interactive shell
             self.ssh_shell = self.ssh_client.invoke_shell()
-            self.ssh_shell.settimeout(0.1)  # Non-blocking mode
+            self.ssh_shell.settimeout(0.1)  # recv() only waits briefly if select() woke up without data
             
             # Start thread to continuously read output
             self.output_thread = SSHOutputThread(self.ssh_shell, self.connection_id)
             self.output_thread.output_received.connect(self.handle_output)
+            self.output_thread.closed.connect(self.handle_closed)
             self.output_thread.start()
             
             # Initialize remote environment
@@ -474,9 +740,7 @@ class SSHConnectionPanel(QFrame):
     def cleanup_connection(self):
         """Clean up SSH connection resources"""
         if self.output_thread:
-            self.output_thread.stop()
-            self.output_thread.quit()
-            self.output_thread.wait()
+            self.output_thread.stop()  # Wakes the thread up and waits for it
             self.output_thread = None
             
         if self.ssh_shell:
@@ -622,9 +886,9 @@ class SSHClientGUI(QMainWindow):
     def handle_local_output(self, text, terminal_id):
         """Route local command output to the appropriate terminal"""
         if terminal_id == 1:
-            self.local_terminal1.append_local_output(text)
+            self.local_terminal1.append_command_output(text)
         else:
-            self.local_terminal2.append_local_output(text)
+            self.local_terminal2.append_command_output(text)
 
     def update_inputs_readonly(self):
         """Update read-only state of connection inputs based on connection status"""
@@ -666,6 +930,8 @@ class SSHClientGUI(QMainWindow):
         """Clean up resources when closing the application"""
         self.connection1.cleanup_connection()
         self.connection2.cleanup_connection()
+        self.local_terminal1.shutdown()
+        self.local_terminal2.shutdown()
         event.accept()
 
 if __name__ == '__main__':
@@ -1,40 +1,59 @@
 #include <ros/ros.h>
 #include <std_msgs/String.h>
 #include <serial/serial.h>
+#include "line_splitter.h"
+#include <algorithm>
+#include <ctime>
 #include <sstream>
 #include <string>
+#include <vector>
 
 class SerialReader {  // Define a SerialReader class
 public:
-    SerialReader() {
+    SerialReader() : splitter_(param("buffer_size", 65536), param("max_line_length", 256)), reported_lines_(0) {
         ros::NodeHandle nh;  // Create a node handle
-        serial_port.setPort("/dev/ttyUSB1");  // Set the serial port
-        serial_port.setBaudrate(2000000);  // Set the baud rate
-        serial::Timeout to = serial::Timeout::simpleTimeout(1000);  // Set a timeout
+        ros::NodeHandle private_nh("~");  // Node handle for the private parameters
+        std::string port;
+        int baudrate, read_timeout;
+        private_nh.param("read_size", read_size_, 4096);  // Largest chunk taken from the port per read
+        private_nh.param("batch", batch_, false);  // Publish all lines of a read in one message
+        private_nh.param("port", port, std::string("/dev/ttyUSB1"));  // Serial port of the sensor chain
+        private_nh.param("baudrate", baudrate, 2000000);
+        private_nh.param("read_timeout_ms", read_timeout, 100);  // Longest wait for data before ROS events are handled
+        private_nh.param("report_interval", report_interval_, 5.0);  // Seconds between CPU and rate reports, 0 disables them
+        serial_port.setPort(port);  // Set the serial port
+        serial_port.setBaudrate(baudrate);  // Set the baud rate
+        serial::Timeout to = serial::Timeout::simpleTimeout(read_timeout);  // Set a timeout
         serial_port.setTimeout(to);  // Apply the timeout setting
         serial_port.open();  // Open the serial port
         publisher_ = nh.advertise<std_msgs::String>("raw_tof", 10);  // Create a publisher
     }
 
     void readSerialData() {
-        //ros::Rate loop_rate(100); // Set the loop rate in Hz
+        report_wall_ = ros::WallTime::now();
+        report_cpu_ = std::clock();
         while (ros::ok()) {
-            size_t available = serial_port.available();
-            if (available > 0) {  // Check if data is available
-                std::string data;
-                serial_port.read(data, available);
-                buffer += data;  // Save data to buffer
-                size_t pos = 0;
-                while ((pos = buffer.find('\n')) != std::string::npos) {  // Find newline characters
-                    std::string line = buffer.substr(0, pos);  // Get one line of data
-                    std_msgs::String msg;
-                    msg.data = line;  // Set the message data
-                    publisher_.publish(msg);  // Publish the tof message
-                    buffer.erase(0, pos + 1);  // Erase processed data
+            // Sleep in select() until data arrives or the read timeout expires
+            if (serial_port.waitReadable()) {
+                // A device that is readable but empty was disconnected, reading one byte then throws
+                size_t available = std::max(serial_port.available(), size_t(1));
+                chunk_.resize(std::min(available, size_t(std::max(read_size_, 1))));
+                size_t count = serial_port.read(chunk_.data(), chunk_.size());
+                const char *data = reinterpret_cast<const char *>(chunk_.data());
+                for (size_t done = 0; done < count;) {  // More than one pass only if the read exceeds the buffer
+                    done += splitter_.write(data + done, count - done);  // Save data to buffer
+                    if (batch_) {
+                        publishBatch();
+                    } else {
+                        std_msgs::String msg;
+                        while (splitter_.next(msg.data)) {  // Get one line of data
+                            publisher_.publish(msg);  // Publish the tof message
+                        }
+                    }
                 }
             }
             ros::spinOnce();  // Handle ROS events
-            //loop_rate.sleep();  // Sleep
+            report();
         }
     }
 
@@ -45,9 +64,58 @@ public:
     }
 
 private:
+    static int param(const std::string &name, int default_value) {
+        int value;
+        ros::NodeHandle("~").param(name, value, default_value);
+        return value;
+    }
+
+    void publishBatch() {
+        std_msgs::String msg;
+        bool first = true;
+        while (splitter_.next(line_)) {
+            if (!first) {
+                msg.data += '\n';  // All complete lines, separated by newlines
+            }
+            msg.data += line_;
+            first = false;
+        }
+        if (!first) {
+            publisher_.publish(msg);  // Publish them as one tof message
+        }
+    }
+
+    void report() {
+        if (report_interval_ <= 0.0) {
+            return;
+        }
+        ros::WallTime now = ros::WallTime::now();
+        double elapsed = (now - report_wall_).toSec();
+        if (elapsed < report_interval_) {
+            return;
+        }
+        std::clock_t cpu = std::clock();  // Processor time of this process
+        double cpu_seconds = double(cpu - report_cpu_) / CLOCKS_PER_SEC;
+        ROS_INFO("raw_tof: %.1f lines/s, %.1f%% CPU, %llu bytes read, %llu bytes discarded",
+                 (splitter_.lines() - reported_lines_) / elapsed, 100.0 * cpu_seconds / elapsed,
+                 static_cast<unsigned long long>(splitter_.bytes()),
+                 static_cast<unsigned long long>(splitter_.discarded()));
+        report_wall_ = now;
+        report_cpu_ = cpu;
+        reported_lines_ = splitter_.lines();
+    }
+
     serial::Serial serial_port;  // Serial port object
     ros::Publisher publisher_;  // ROS publisher
-    std::string buffer;  // Buffer for reading data
+    LineSplitter splitter_;  // Buffer for reading data
+    std::string line_;  // Line taken from the buffer
+    std::vector<uint8_t> chunk_;  // Bytes of one read
+    int read_size_;  // Bytes taken from the port per read
+    bool batch_;  // Publish one message per read instead of one per line
+    double report_interval_;  // Seconds between reports
+    uint64_t reported_lines_;  // Lines split at the last report
+    ros::WallTime report_wall_;  // Wall time of the last report
+    std::clock_t report_cpu_;  // Processor time at the last report
 };
 
 int main(int argc, char **argv) {
@@ -1,79 +1,414 @@
 #!/usr/bin/env python3
+import array
+import contextlib
+import functools
+import sys
+import threading
+import time
 import rclpy
+from rclpy.duration import Duration
 from rclpy.node import Node
-import re
-from sensor_msgs.msg import PointCloud2, PointField
-from std_msgs.msg import String
-import sensor_msgs_py.point_cloud2 as pc2
-from std_msgs.msg import Header
+from rclpy.parameter import Parameter
+from rclpy.qos import HistoryPolicy, QoSProfile, ReliabilityPolicy
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from sensor_msgs.msg import Image, PointCloud2, PointField
+from std_msgs.msg import Float64MultiArray, MultiArrayDimension, String, UInt8MultiArray
+from rcl_interfaces.msg import SetParametersResult
+from tof.cliff import CliffDetector, load_floor
+from tof.decoder import Decoder
+from tof.diagnostics import SensorDiagnostics
+from tof.filter import TemporalFilter
+from tof.frame import POINT_STEP
+from tof.geometry import CoordinateTable, PIXELS_PER_SENSOR
+from tof.image import DepthImage
+from tof.latency import STAGES, LatencyHistogram
+from tof.merge import FrameMerger
+from tof.region import RegionFilter
+from tof.serial_port import SerialReader
 
-Number_sensors = 5  # Define the number of connected Tof sensors
 First_CANID = 16    # Define the CAN ID of first Tof sensor
 Last_CANID = 20     # Define the CAN ID of last Tof sensor
+Frame_timeout = 0.5  # Define the time in seconds after which an incomplete frame is published
+Filter_mode = 'none'  # Define the temporal filter: 'none', 'median', 'ema' or 'outlier'
+Filter_window = 5  # Define the number of frames the median and outlier filters look back
+Serial_port = '/dev/ttyUSB1'  # Define the default serial port used with source 'serial'
+Baud_rate = 2000000  # Define the default baud rate used with source 'serial'
+Protocol = 'auto'  # Define the format of the serial bytes with source 'serial': 'ascii' lines, 'binary' packets or 'auto'
+Stamp_source = 'first'  # Define the header stamp: receive time of the 'first' or 'last' line of a frame, or 'publish' time
+Qos_reliability = 'best_effort'  # Define the reliability of the clouds: 'best_effort' never waits for a slow subscriber, or 'reliable'
+Qos_depth = 1  # Define the number of clouds kept for a subscriber, the newest wins
+
+FIELDS = [
+    PointField(name='x', offset=0, datatype=PointField.FLOAT32, count=1),
+    PointField(name='y', offset=4, datatype=PointField.FLOAT32, count=1),
+    PointField(name='z', offset=8, datatype=PointField.FLOAT32, count=1)
+]  # Define the fields for the point cloud, matching the Frame layout
+LEVELS = [DiagnosticStatus.OK, DiagnosticStatus.WARN, DiagnosticStatus.ERROR]  # By SensorStatus.level
+
+class Chain(object):
+    """Decoder, filter and serial reader of one daisy chain."""
+
+    def __init__(self, index, name, decoder, temporal_filter):
+        self.index = index  # Position of the chain in the merged cloud
+        self.name = name  # Suffix of the per-chain topics, empty with a single chain
+        self.decoder = decoder
+        self.filter = temporal_filter
+        self.diagnostics = SensorDiagnostics(decoder)
+        self.levels = {}  # Last diagnostic level per CAN ID, to log only changes
+        self.lock = threading.Lock()  # Every chain is fed by its own reader thread
+        self.reader = None
+        self.raw_publisher = None
+        self.publisher = None  # Cloud of this chain alone, only with several chains
+        self.dropped = 0  # Frames not published because a newer one was already decoded
+        self.cliff = None  # Compares every frame against the floor model of the chain
+        self.cliff_publisher = None
+        self.image = None  # Depth image buffer, allocated for the first subscriber
+        self.image_publisher = None
+
+def qos_profile(reliability, depth):
+    """Return a keep-last QoSProfile, reliability is 'best_effort' or 'reliable'."""
+    policies = {'best_effort': ReliabilityPolicy.BEST_EFFORT, 'reliable': ReliabilityPolicy.RELIABLE}
+    if reliability not in policies:
+        raise ValueError(f"QoS reliability must be 'best_effort' or 'reliable', not '{reliability}'")
+    return QoSProfile(history=HistoryPolicy.KEEP_LAST, depth=depth, reliability=policies[reliability])
 
 class SerialToPointCloud2(Node):
     def __init__(self):
         super().__init__('TOF_to_pointcloud2')  # Initialize the ROS2 node
-        self.subscriber_ = self.create_subscription(
-            String, 'raw_tof', self.process_data_callback, 10)  # Subscribe to raw tof data
-        self.publisher_ = self.create_publisher(PointCloud2, 'tof_sensor', 10)  # Set up a publisher for the PointCloud2 data
-        self.points = []  # Initialize a list to store point cloud data
+        self.qos = qos_profile(self.declare_parameter('qos_reliability', Qos_reliability).value,
+                               self.declare_parameter('qos_depth', Qos_depth).value)  # Of the clouds
+        raw_qos = qos_profile(self.declare_parameter('raw_qos_reliability', 'best_effort').value,
+                              self.declare_parameter('raw_qos_depth', 10).value)  # Of the raw_tof lines
+        self.publisher_ = self.create_publisher(PointCloud2, 'tof_sensor', self.qos)  # Set up a publisher for the PointCloud2 data
+        self.lock = threading.Lock()  # Serializes parameter updates
+        self.stamp_source = self.declare_parameter('stamp_source', Stamp_source).value
+        if self.stamp_source not in ('first', 'last', 'publish'):
+            raise ValueError(f"stamp_source must be 'first', 'last' or 'publish', not '{self.stamp_source}'")
+        self.latency = LatencyHistogram()  # Serial read to publish latency of the tof_sensor clouds
+        self.latency_lock = threading.Lock()
+        self.latency_publisher = self.create_publisher(Float64MultiArray, 'tof_latency', 10)
 
-    def process_data_callback(self, data):
-        self.process_data(data.data)  # Process the received data
-        if len(self.points) >= Number_sensors * 32:  # Check if the list of points is full
-            self.publish_points()  # Publish the point cloud
-            self.points = []  # Clear the list
-
-    def process_data(self, data):
-        parts = data.split(':')  # Split the data by colon
-        if len(parts) < 2:  # Check if the data is complete
-            self.get_logger().error(f"Received malformed data: {data}")  # Log an error message
-            return
+        first_canid = self.declare_parameter('first_canid', First_CANID).value
+        last_canid = self.declare_parameter('last_canid', Last_CANID).value
+        timeout = self.declare_parameter('frame_timeout', Frame_timeout).value
+        self.filter_args = dict(
+            mode=self.declare_parameter('filter_mode', Filter_mode).value,
+            window=self.declare_parameter('filter_window', Filter_window).value,
+            alpha=self.declare_parameter('filter_alpha', 0.5).value,  # Weight of the newest frame in the EMA
+            threshold=self.declare_parameter('filter_threshold', 0.1).value)  # Outlier distance from the median in metres
 
-        device_id_str = re.sub(r'\D', '', parts[0])  # Extract the device ID
-        if not device_id_str.isdigit():  # Check if the device ID is valid
-            self.get_logger().error(f"Invalid device ID: {parts[0]}")
-            return
-        device_id = int(device_id_str)  # Convert device ID to integer
+        source = self.declare_parameter('source', 'topic').value
+        ports = [self.declare_parameter('port', Serial_port).value]
+        first_canids, last_canids = [first_canid], [last_canid]
+        protocol, max_line_length = 'ascii', 256  # raw_tof always carries lines
+        if source == 'serial':  # Read the serial ports in this process, one chain per port
+            protocol = self.declare_parameter('protocol', Protocol).value
+            max_line_length = self.declare_parameter('max_line_length', 256).value
+            ports = self.declare_parameter('ports', Parameter.Type.STRING_ARRAY).value or ports
+            first_canids = self.declare_parameter('first_canids', Parameter.Type.INTEGER_ARRAY).value or first_canids * len(ports)
+            last_canids = self.declare_parameter('last_canids', Parameter.Type.INTEGER_ARRAY).value or last_canids * len(ports)
+            if not len(ports) == len(first_canids) == len(last_canids):
+                raise ValueError("ports, first_canids and last_canids need one entry per chain")
+        self.chains = [
+            Chain(index, f'_{index}' if len(ports) > 1 else '',
+                  Decoder(first, last, timeout, max_line_length, protocol),  # Parse the raw tof lines or packets and assemble them into frames
+                  TemporalFilter(**self.filter_args))
+            for index, (first, last) in enumerate(zip(first_canids, last_canids))]
 
-        data_parts = parts[1].split(' ')  # Split the coordinates and distance data
-        if len(data_parts) < 2:
-            self.get_logger().error(f"Malformed coordinates and distance: {parts[1]}")
-            return
+        self.merger = None
+        self.merge_lock = threading.Lock()
+        if len(self.chains) > 1:  # Merge the frames of all chains into the tof_sensor cloud
+            offsets = self.declare_parameter('chain_offsets', Parameter.Type.DOUBLE_ARRAY).value  # x, y, z of every chain
+            if offsets and len(offsets) != 3 * len(self.chains):
+                raise ValueError("chain_offsets needs an x, y, z position per chain")
+            self.merger = FrameMerger(
+                [len(chain.decoder.table) for chain in self.chains], timeout,
+                [offsets[3 * i:3 * i + 3] for i in range(len(self.chains))] if offsets else None)
+            for chain in self.chains:
+                chain.publisher = self.create_publisher(PointCloud2, 'tof_sensor' + chain.name, self.qos)  # Only filled while subscribed
 
-        coords = re.sub(r'\D', '', data_parts[0])  # Extract the coordinates
-        if len(coords) < 2:
-            self.get_logger().error(f"Coordinates are too short: {coords}")
-            return
-        distance_str = re.sub(r'\D', '', data_parts[1])  # Extract the distance
+        self.region_args = dict(
+            x=self.declare_parameter('roi_x', Parameter.Type.DOUBLE_ARRAY).value,  # [min, max] distance in metres
+            y=self.declare_parameter('roi_y', Parameter.Type.DOUBLE_ARRAY).value,
+            z=self.declare_parameter('roi_z', Parameter.Type.DOUBLE_ARRAY).value,
+            sensor_masks=self.declare_parameter('roi_sensor_masks', Parameter.Type.INTEGER_ARRAY).value,  # Kept pixels per sensor
+            voxel_size=self.declare_parameter('roi_voxel_size', 0.0).value)
+        self.region = self.create_region(sum(len(chain.decoder.table) for chain in self.chains), self.region_args)
 
-        if not distance_str.isdigit():  # Check if the distance is valid
-            self.get_logger().error(f"Invalid distance: {distance_str}")
-            return
+        floors = self.declare_parameter('cliff_floors', Parameter.Type.STRING_ARRAY).value  # Floor model file per chain
+        if floors:
+            if len(floors) != len(self.chains):
+                raise ValueError("cliff_floors needs one floor model per chain")
+            margin = self.declare_parameter('cliff_margin', 0.05).value  # Distance beyond the floor that is a drop-off
+            min_pixels = self.declare_parameter('cliff_min_pixels', 3).value  # Pixels of a sensor that make a cliff
+            for chain, path in zip(self.chains, floors):
+                chain.cliff = CliffDetector(load_floor(path), margin, min_pixels)
+                if len(chain.cliff) != len(chain.decoder.table):
+                    raise ValueError(f"{path} is not a floor model of CAN ID {chain.decoder.table.first_canid} to {chain.decoder.table.last_canid}")
+                chain.cliff_publisher = self.create_publisher(
+                    UInt8MultiArray, 'tof_cliff' + chain.name, qos_profile('reliable', 1))  # Reliable, so a safety stop may subscribe either way
+
+        for chain in self.chains:
+            chain.image_publisher = self.create_publisher(Image, 'tof_depth' + chain.name, self.qos)  # Only filled while subscribed
+
+        self.add_on_set_parameters_callback(self.parameters_callback)
+        self.timeout_timer = self.create_timer(0.05, self.timeout_callback)  # Publish incomplete frames after the timeout
+
+        self.reported = self.counters()
+        self.report_timer = self.create_timer(5.0, self.report_counters)  # Summarize rejected lines instead of logging each one
+        self.latency_timer = self.create_timer(5.0, self.publish_latency)  # Latency histogram of the last 5 s
+        self.diagnostics_publisher = self.create_publisher(DiagnosticArray, '/diagnostics', 10)
+        self.diagnostics_timer = self.create_timer(1.0, self.publish_diagnostics)  # Health of every sensor
+
+        if source == 'serial':
+            baudrate = self.declare_parameter('baudrate', Baud_rate).value
+            read_size = self.declare_parameter('read_size', 65536).value
+            for chain, port in zip(self.chains, ports):
+                chain.raw_publisher = self.create_publisher(String, 'raw_tof' + chain.name, raw_qos)  # Debug output, only filled while subscribed
+                chain.reader = SerialReader(
+                    port, baudrate, functools.partial(self.serial_bytes_callback, chain),
+                    read_size, raw=True)  # Read every port in a dedicated thread, the decoder splits the bytes
+            for chain in self.chains:
+                chain.reader.start()
+        else:
+            self.subscriber_ = self.create_subscription(
+                String, 'raw_tof', self.process_data_callback, raw_qos)  # Subscribe to raw tof data
+
+    def parameters_callback(self, params):
+        with self.lock, contextlib.ExitStack() as stack:
+            for chain in self.chains:
+                stack.enter_context(chain.lock)
+            return self.update_parameters(params)
+
+    def update_parameters(self, params):
+        decoder = self.chains[0].decoder
+        first_canid, last_canid = decoder.table.first_canid, decoder.table.last_canid
+        timeout = decoder.assembler.timeout
+        filter_args = dict(self.filter_args)
+        region_args = dict(self.region_args)
+        for param in params:
+            if param.name == 'first_canid':
+                first_canid = param.value
+            elif param.name == 'last_canid':
+                last_canid = param.value
+            elif param.name == 'frame_timeout':
+                timeout = param.value
+            elif param.name.startswith('filter_'):
+                filter_args[param.name[len('filter_'):]] = param.value
+            elif param.name.startswith('roi_'):
+                region_args[param.name[len('roi_'):]] = param.value
+        if self.merger is not None and not decoder.table.matches(first_canid, last_canid):
+            return SetParametersResult(successful=False, reason="Set first_canids and last_canids at startup with several chains")
+        if self.chains[0].cliff is not None and not decoder.table.matches(first_canid, last_canid):
+            return SetParametersResult(successful=False, reason="The cliff floor model is calibrated for the current chain")
         try:
-            y, z = 0.01*(int(coords[1])) + 0.08*(device_id-((Last_CANID + First_CANID)/2)-0.5), 0.02*(5-(int(coords[0]))) + 0.08  # Convert to point cloud coordinates
-            x = 0.001 * (int(distance_str))
-        except IndexError as e:
-            self.get_logger().error(f"Index error while processing data: {e}")  # Log an index error
-            return
+            TemporalFilter(**filter_args)  # Validate before changing anything
+            size = len(CoordinateTable(first_canid, last_canid)) if self.merger is None else len(self.merger.points)
+            region = self.create_region(size, region_args)
+            decoder.configure(first_canid, last_canid, timeout)
         except ValueError as e:
-            self.get_logger().error(f"Value error while processing data: {e}")  # Log a value error
+            return SetParametersResult(successful=False, reason=str(e))
+        for chain in self.chains:
+            chain.decoder.configure(chain.decoder.table.first_canid, chain.decoder.table.last_canid, timeout)
+            if filter_args != self.filter_args:
+                chain.filter = TemporalFilter(**filter_args)  # Start a new history only if the filter changed
+        self.filter_args = filter_args
+        self.region_args = region_args
+        self.region = region
+        if self.merger is not None:
+            with self.merge_lock:  # The chain threads read it in add() and poll()
+                self.merger.timeout = timeout
+        return SetParametersResult(successful=True)
+
+    def create_region(self, size, region_args):
+        """Return the RegionFilter of the tof_sensor cloud, or None if it publishes every point."""
+        region = RegionFilter(size, **region_args)  # Raises ValueError for invalid arguments
+        return region if region.enabled else None
+
+    def counters(self):
+        counters = {}
+        for chain in self.chains:
+            chain_counters = chain.decoder.counters()
+            chain_counters.update(outliers=chain.filter.rejected, dropped_frames=chain.dropped)
+            for name, count in chain_counters.items():
+                counters[name] = counters.get(name, 0) + count
+        if self.merger is not None:
+            counters.update(partial_merges=self.merger.partial, replaced_merge_frames=self.merger.replaced)
+        return counters
+
+    def report_counters(self):
+        counters = self.counters()
+        changes = {name: count - self.reported.get(name, 0)
+                   for name, count in counters.items() if count > self.reported.get(name, 0)}
+        if changes:
+            summary = ', '.join(f"{count} {name}" for name, count in changes.items())
+            self.get_logger().warning(f"Raw tof problems in the last 5 s: {summary}")
+        self.reported = counters
+        for chain in self.chains:
+            if chain.reader is not None and chain.reader.error is not None:
+                self.get_logger().error(f"Stopped reading {chain.reader.port}: {chain.reader.error}")
+                chain.reader.error = None
+
+    def publish_diagnostics(self):
+        msg = DiagnosticArray()
+        msg.header.stamp = self.get_clock().now().to_msg()
+        for chain in self.chains:
+            with chain.lock:
+                statuses = chain.diagnostics.report()
+            hardware_id = chain.reader.port if chain.reader is not None else 'raw_tof'
+            for status in statuses:
+                name = f"tof_sensor{chain.name}: CAN ID {status.canid}"
+                last_seen = 'never' if status.last_seen is None else f"{time.monotonic() - status.last_seen:.3f} s ago"
+                msg.status.append(DiagnosticStatus(
+                    level=LEVELS[status.level], name=name, message=status.message, hardware_id=hardware_id,
+                    values=[KeyValue(key='frame_rate_hz', value=f"{status.rate:.1f}"),
+                            KeyValue(key='completeness', value=f"{status.completeness:.3f}"),
+                            KeyValue(key='rejected_lines', value=str(status.rejected)),
+                            KeyValue(key='last_seen', value=last_seen)]))
+                if chain.levels.get(status.canid, 0) != status.level:  # Log level changes, not every report
+                    if status.level:
+                        self.get_logger().warning(f"{name}: {status.message}")
+                    else:
+                        self.get_logger().info(f"{name}: recovered")
+                    chain.levels[status.canid] = status.level
+        self.diagnostics_publisher.publish(msg)
+
+    def publish_latency(self):
+        with self.latency_lock:
+            if not self.latency.frames():
+                return
+            msg = Float64MultiArray()
+            bins = len(self.latency.edges_ms) + 1
+            msg.layout.dim = [
+                MultiArrayDimension(label='stages:' + ','.join(STAGES), size=len(STAGES), stride=len(STAGES) * bins),
+                MultiArrayDimension(label='upper_edges_ms:' + ','.join(map(str, self.latency.edges_ms)) + ',inf',
+                                    size=bins, stride=bins)]
+            msg.data = [float(count) for count in self.latency.counts.ravel()]
+            self.latency.reset()
+        self.latency_publisher.publish(msg)
+
+    def process_data_callback(self, data):
+        stamp = time.monotonic()  # Without a serial read, the message arrival is the receive time
+        chain = self.chains[0]
+        with chain.lock:
+            self.process_frames(chain, chain.decoder.feed_lines(data.data.split('\n'), stamp))  # A batched message carries several lines
+
+    def serial_bytes_callback(self, chain, data, stamp):
+        decoder = chain.decoder
+        data = decoder.detect(data)  # While the format is detected b'', then all bytes read so far
+        if decoder.protocol == 'ascii':
+            lines = decoder.splitter.split(data)  # Keeps the incomplete line for the next read
+            if lines and chain.raw_publisher.get_subscription_count() > 0:
+                chain.raw_publisher.publish(String(data=b'\n'.join(lines).decode('ascii', 'replace')))
+            with chain.lock:
+                self.process_frames(chain, decoder.feed_lines(lines, stamp))
+        elif decoder.protocol == 'binary':
+            with chain.lock:
+                self.process_frames(chain, decoder.feed_bytes(data, stamp))
+
+    def timeout_callback(self):
+        for chain in self.chains:
+            with chain.lock:
+                frame = chain.decoder.poll()
+                if frame is not None:
+                    chain.diagnostics.add(frame)
+                    self.process_frame(chain, frame)
+        if self.merger is not None:
+            with self.merge_lock:
+                merged = self.merger.poll()
+                if merged is not None:
+                    self.publish_points(self.publisher_, merged, time.monotonic())
+
+    def process_frames(self, chain, frames):
+        latest = None
+        for frame in frames:  # Frames completed by a read or message
+            chain.diagnostics.add(frame)  # Count the received pixels before the filter
+            if latest is not None:  # A backlog was read at once, publish only its newest frame
+                chain.dropped += 1
+            latest = frame  # Stays valid until the decoder emits the next frame
+        if latest is not None:
+            self.process_frame(chain, latest)
+
+    def publish_cliff(self, chain, frame):
+        msg = UInt8MultiArray()
+        table = chain.decoder.table
+        msg.layout.dim = [MultiArrayDimension(label=f'canid:{table.first_canid}-{table.last_canid}',
+                                              size=table.number_sensors, stride=table.number_sensors)]
+        msg.data = array.array('B', chain.cliff.detect(frame.points).tobytes())  # 0 floor, 1 cliff, 2 blind per sensor
+        chain.cliff_publisher.publish(msg)
+
+    def publish_image(self, chain, frame):
+        if chain.image is None or chain.image.sensors * PIXELS_PER_SENSOR != len(frame):  # First subscriber or a new chain
+            chain.image = DepthImage(len(frame))
+        pixels = chain.image.fill(frame.points)  # Distance in millimetres, 0 without a distance
+        image = Image()
+        image.header.stamp = self.stamp(frame).to_msg()
+        image.header.frame_id = "tof_sensor"
+        image.height = chain.image.height  # Pixel rows, each sensor is a tile of 8 columns in CAN ID order
+        image.width = chain.image.width
+        image.encoding = '16UC1'
+        image.is_bigendian = sys.byteorder != 'little'
+        image.step = 2 * image.width
+        data = array.array('B')
+        data.frombytes(memoryview(pixels).cast('B'))
+        image.data = data
+        chain.image_publisher.publish(image)
+
+    def process_frame(self, chain, frame):
+        parsed = time.monotonic()
+        if chain.cliff is not None:
+            self.publish_cliff(chain, frame)  # First, on the unfiltered frame, for the lowest latency
+        chain.filter.apply(frame)  # Denoise x in place, a no-op with filter_mode 'none'
+        if chain.image_publisher.get_subscription_count() > 0:
+            self.publish_image(chain, frame)
+        if self.merger is None:
+            self.publish_points(self.publisher_, frame, parsed)  # Publish the point cloud
             return
+        if chain.publisher.get_subscription_count() > 0:
+            self.publish_points(chain.publisher, frame)
+        with self.merge_lock:
+            merged = self.merger.add(chain.index, frame)
+            if merged is not None:
+                self.publish_points(self.publisher_, merged, parsed)
+
+    def stamp(self, frame):
+        """Return the ROS time the frame was received, following stamp_source."""
+        now = self.get_clock().now()
+        if self.stamp_source == 'publish':
+            return now
+        received = frame.first_stamp if self.stamp_source == 'first' else frame.last_stamp
+        return now - Duration(nanoseconds=int((time.monotonic() - received) * 1e9))  # Monotonic age moved onto the ROS clock
+
+    def publish_points(self, publisher, frame, parsed=None):
+        points = frame.points  # float32 x, y, z rows, already in PointCloud2 layout
+        dense = frame.dense
+        region = self.region
+        if region is not None and publisher is self.publisher_:
+            points = region.apply(points)  # Crop and downsample before serializing
+            dense = True  # Points without a distance are dropped
+        cloud = PointCloud2()
+        cloud.header.stamp = self.stamp(frame).to_msg()  # Set the timestamp
+        cloud.header.frame_id = "tof_sensor"  # Set the message frame ID
+        cloud.height = 1
+        cloud.width = len(points)
+        cloud.fields = FIELDS
+        cloud.is_bigendian = sys.byteorder != 'little'
+        cloud.point_step = POINT_STEP
+        cloud.row_step = POINT_STEP * len(points)
+        cloud.is_dense = dense  # Missing pixels and outliers have a NaN x
+        data = array.array('B')
+        data.frombytes(memoryview(points).cast('B'))  # Copy the buffer once into the message, no per-point packing
+        cloud.data = data
+        publisher.publish(cloud)  # Publish to ROS2
+        if parsed is not None:  # Only the tof_sensor clouds count in the latency histogram
+            with self.latency_lock:
+                self.latency.record(frame.first_stamp, frame.last_stamp, parsed, time.monotonic())
 
-        self.points.append([x, y, z])  # Add the point to the list
-
-    def publish_points(self):
-        header = Header()  # Create a header
-        header.stamp = self.get_clock().now().to_msg()  # Set the timestamp
-        header.frame_id = "tof_sensor"  # Set the message frame ID
-        fields = [
-            PointField(name='x', offset=0, datatype=PointField.FLOAT32, count=1),
-            PointField(name='y', offset=4, datatype=PointField.FLOAT32, count=1),
-            PointField(name='z', offset=8, datatype=PointField.FLOAT32, count=1)
-        ]  # Define the fields for the point cloud
-        cloud = pc2.create_cloud(header, fields, self.points)  # Create the point cloud message
-        self.publisher_.publish(cloud)  # Publish to ROS2
+    def destroy_node(self):
+        for chain in self.chains:
+            if chain.reader is not None:
+                chain.reader.stop()
+        super().destroy_node()
 
 def main(args=None):
     rclpy.init(args=args)
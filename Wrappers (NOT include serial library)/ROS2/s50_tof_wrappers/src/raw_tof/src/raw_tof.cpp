@@ -1,27 +1,58 @@
 #include <rclcpp/rclcpp.hpp>
 #include <std_msgs/msg/string.hpp>
 #include <serial/serial.h>
+#include "line_splitter.h"
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <mutex>
 #include <sstream>
+#include <stdexcept>
 #include <string>
+#include <thread>
+#include <vector>
 
 class SerialReader : public rclcpp::Node {
 public:
-    SerialReader() : Node("raw_tof_node") {
-        serial_port.setPort("/dev/ttyUSB1");  // Set the serial port
-        serial_port.setBaudrate(2000000);  // Set the baud rate
-        serial::Timeout to = serial::Timeout::simpleTimeout(1000);  // Set a timeout
+    SerialReader()
+        : Node("raw_tof_node"),
+          splitter_(this->declare_parameter<int>("buffer_size", 65536),  // Capacity of the line buffer
+                    this->declare_parameter<int>("max_line_length", 256))  // Longer lines are discarded
+    {
+        batch_ = this->declare_parameter<bool>("batch", false);  // Publish all lines of a read in one message
+        read_size_ = this->declare_parameter<int>("read_size", 4096);  // Largest chunk taken from the port per read
+        int read_timeout = this->declare_parameter<int>("read_timeout_ms", 100);  // Longest blocking wait, bounds the shutdown time
+        serial_port.setPort(this->declare_parameter<std::string>("port", "/dev/ttyUSB1"));  // Serial port of the sensor chain
+        serial_port.setBaudrate(this->declare_parameter<int>("baudrate", 2000000));  // Set the baud rate
+        serial::Timeout to = serial::Timeout::simpleTimeout(read_timeout);  // Set a timeout
         serial_port.setTimeout(to);  // Apply the timeout setting
         serial_port.open();  // Open the serial port
-        publisher_ = this->create_publisher<std_msgs::msg::String>("raw_tof", 10);  // Create a publisher
+        rclcpp::QoS qos(rclcpp::KeepLast(this->declare_parameter<int>("qos_depth", 10)));  // Messages kept for a slow subscriber
+        std::string reliability = this->declare_parameter<std::string>("qos_reliability", "best_effort");
+        if (reliability == "best_effort") {
+            qos.best_effort();  // Never block on a subscriber that falls behind
+        } else if (reliability == "reliable") {
+            qos.reliable();
+        } else {
+            throw std::invalid_argument("qos_reliability must be 'best_effort' or 'reliable', not '" + reliability + "'");
+        }
+        publisher_ = this->create_publisher<std_msgs::msg::String>("raw_tof", qos);  // Create a publisher
 
-        // Create a timer to periodically call readSerialData()
-        timer_ = this->create_wall_timer(
-            std::chrono::milliseconds(10),
-            std::bind(&SerialReader::readSerialData, this)
+        // Log the stream counters and the serial-to-publish latency of the reader thread
+        report_timer_ = this->create_wall_timer(
+            std::chrono::seconds(5),
+            std::bind(&SerialReader::reportStatistics, this)
         );
+        // Block on the serial port in a dedicated thread
+        running_ = true;
+        reader_ = std::thread(&SerialReader::readSerialData, this);
     }
 
     ~SerialReader() {
+        running_ = false;  // The reader notices within read_timeout_ms
+        if (reader_.joinable()) {
+            reader_.join();
+        }
         if (serial_port.isOpen()) {
             serial_port.close();
         }
@@ -29,26 +60,107 @@ public:
 
 private:
     void readSerialData() {
-        size_t available = serial_port.available();
-        if (available > 0) {  // Check if data is available
-            std::string data;
-            serial_port.read(data, available);
-            buffer += data;  // Save data to buffer
-            size_t pos = 0;
-            while ((pos = buffer.find('\n')) != std::string::npos) {  // Find newline characters
-                std::string line = buffer.substr(0, pos);  // Get one line of data
-                auto msg = std_msgs::msg::String();
-                msg.data = line;  // Set the message data
-                publisher_->publish(msg);  // Publish the tof message
-                buffer.erase(0, pos + 1);  // Erase processed data
+        std::vector<uint8_t> chunk(std::max(read_size_, 1));
+        while (running_ && rclcpp::ok()) {
+            try {
+                if (!serial_port.waitReadable()) {
+                    continue;  // Timed out, check for shutdown
+                }
+                auto received = std::chrono::steady_clock::now();
+                // Take what is buffered; reading a single byte from a device that is
+                // readable but empty throws, which is how a disconnect shows up
+                size_t wanted = std::min(std::max(serial_port.available(), size_t(1)), chunk.size());
+                size_t count = serial_port.read(chunk.data(), wanted);
+                const char *data = reinterpret_cast<const char *>(chunk.data());
+                bool published = false;
+                for (size_t done = 0; done < count;) {  // More than one pass only if the read exceeds the buffer
+                    done += splitter_.write(data + done, count - done);  // Save data to buffer
+                    published |= batch_ ? publishBatch() : publishLines();
+                }
+                recordStatistics(published, std::chrono::steady_clock::now() - received);
+            } catch (const std::exception &e) {
+                if (rclcpp::ok()) {
+                    RCLCPP_ERROR(this->get_logger(), "Reading the serial port failed: %s", e.what());
+                }
+                return;
+            }
+        }
+    }
+
+    bool publishLines() {
+        bool published = false;
+        auto msg = std_msgs::msg::String();
+        while (splitter_.next(msg.data)) {  // Get one line of data
+            publisher_->publish(msg);  // Publish the tof message
+            published = true;
+        }
+        return published;
+    }
+
+    bool publishBatch() {
+        auto msg = std_msgs::msg::String();
+        bool first = true;
+        while (splitter_.next(line_)) {
+            if (!first) {
+                msg.data += '\n';  // All complete lines, separated by newlines
             }
+            msg.data += line_;
+            first = false;
         }
+        if (first) {
+            return false;
+        }
+        publisher_->publish(msg);  // Publish them as one tof message
+        return true;
+    }
+
+    void recordStatistics(bool published, std::chrono::steady_clock::duration latency) {
+        std::lock_guard<std::mutex> lock(statistics_mutex_);
+        bytes_ = splitter_.bytes();  // Copied for the report timer
+        lines_ = splitter_.lines();
+        discarded_ = splitter_.discarded();
+        if (!published) {
+            return;
+        }
+        double us = std::chrono::duration<double, std::micro>(latency).count();
+        latency_sum_ += us;
+        latency_max_ = std::max(latency_max_, us);
+        latency_count_++;
+    }
+
+    void reportStatistics() {
+        std::lock_guard<std::mutex> lock(statistics_mutex_);
+        if (bytes_ > 0) {  // Totals since the start, a baud mismatch shows up as discarded bytes
+            RCLCPP_INFO(this->get_logger(), "Read %llu bytes, %llu lines, discarded %llu bytes",
+                        static_cast<unsigned long long>(bytes_), static_cast<unsigned long long>(lines_),
+                        static_cast<unsigned long long>(discarded_));
+        }
+        if (latency_count_ == 0) {
+            return;
+        }
+        RCLCPP_INFO(this->get_logger(), "Serial-to-publish latency over %zu reads: mean %.1f us, max %.1f us",
+                    latency_count_, latency_sum_ / latency_count_, latency_max_);
+        latency_sum_ = 0.0;
+        latency_max_ = 0.0;
+        latency_count_ = 0;
     }
 
     serial::Serial serial_port;  // Serial port object
     rclcpp::Publisher<std_msgs::msg::String>::SharedPtr publisher_;  // ROS2 publisher
-    std::string buffer;  // Buffer for reading data
-    rclcpp::TimerBase::SharedPtr timer_;  // Timer for periodic callback
+    LineSplitter splitter_;  // Buffer for reading data
+    std::string line_;  // Line taken from the buffer
+    bool batch_;  // Publish one message per read instead of one per line
+    int read_size_;  // Bytes taken from the port per read
+    std::atomic<bool> running_{false};  // Cleared to stop the reader thread
+    std::thread reader_;  // Thread blocking on the serial port
+    std::mutex statistics_mutex_;  // Guards the statistics below
+    uint64_t bytes_ = 0;  // Totals of the line splitter
+    uint64_t lines_ = 0;
+    uint64_t discarded_ = 0;
+    double latency_sum_ = 0.0;  // Microseconds from data ready to published, since the last report
+    double latency_max_ = 0.0;
+    size_t latency_count_ = 0;
+    rclcpp::TimerBase::SharedPtr report_timer_;  // Timer for the latency report
 };
 
 int main(int argc, char **argv) {
@@ -58,4 +170,3 @@ int main(int argc, char **argv) {
     rclcpp::shutdown();  // Shutdown ROS2
     return 0;
 }
-
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Throughput and latency benchmark of the ToF decode pipeline.
+
+Runs the stages of the pointcloud nodes, parse -> frame assembly -> cloud
+packing, through the tof Decoder without a ROS graph, the way each node
+variant receives its input and packs its clouds:
+
+    ros1        one raw_tof message per line, bytes payload
+    ros2        batched raw_tof messages, array('B') payload
+    ros2-serial chunks of serial bytes split in process (source:=serial)
+    ros2-binary the same chunks as binary packets (protocol:=binary)
+
+The stream is synthetic for 5, 10 and 20 sensors, or a log recorded with
+the record tool. For every run the lines/s, frames/s, the p50/p99 frame
+latency (from the message carrying the first line of a frame to its packed
+cloud) and the bytes allocated per frame are reported. --filter adds the
+temporal filter of the nodes before packing. With --output
+the results are stored as JSON to compare them across changes:
+
+    $ python3 benchmark/bench_pipeline.py --frames 1000 --output results.json
+    $ python3 benchmark/bench_pipeline.py --log capture.toflog --first-canid 16 --last-canid 20
+"""
+import argparse
+import array
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_parser import make_lines  # noqa: E402
+from tof.binary import encode  # noqa: E402
+from tof.decoder import Decoder  # noqa: E402
+from tof.filter import MODES, TemporalFilter  # noqa: E402
+from tof.line_parser import LineParser  # noqa: E402
+from tof.recording import LogReader  # noqa: E402
+from tof.replay import lines_of  # noqa: E402
+
+SENSORS = (5, 10, 20)
+
+
+def pack_ros1(points):
+    return points.tobytes()
+
+
+def pack_ros2(points):
+    data = array.array('B')
+    data.frombytes(memoryview(points).cast('B'))
+    return data
+
+
+class Variant(object):
+    """One node variant: its input messages and cloud packing."""
+
+    def __init__(self, name, pack):
+        self.name = name
+        self.pack = pack
+
+    def messages(self, lines, batch_lines, read_size):
+        if self.name == 'ros1':
+            return lines
+        if self.name == 'ros2':
+            return ['\n'.join(lines[i:i + batch_lines]) for i in range(0, len(lines), batch_lines)]
+        if self.name == 'ros2-binary':
+            parser = LineParser()  # Garbled lines have no packet
+            data = encode([sample for sample in map(parser.parse, lines) if sample is not None])
+        else:
+            data = ('\n'.join(lines) + '\n').encode('ascii')
+        return [data[i:i + read_size] for i in range(0, len(data), read_size)]
+
+    def run(self, messages, first_canid, last_canid, filter_args, trace=False):
+        """Feed the messages through the pipeline and return the measurements."""
+        protocol = 'binary' if self.name == 'ros2-binary' else 'ascii'
+        decoder = Decoder(first_canid, last_canid, timeout=0, protocol=protocol)  # Frames end when the pixel index wraps
+        temporal_filter = TemporalFilter(**filter_args)
+        assembler = decoder.assembler
+        if self.name in ('ros2-serial', 'ros2-binary'):
+            feed = decoder.feed_bytes
+        else:
+            def feed(message, stamp):
+                return decoder.feed_lines(message.split('\n'), stamp)
+        pack = self.pack
+        latencies = []
+        allocations = []
+        if trace:
+            tracemalloc.start()
+        begin = time.perf_counter()
+        start = begin
+        for message in messages:
+            received = time.perf_counter()
+            if not assembler.current.count:
+                start = received  # The next frame starts in this message
+            for frame in feed(message, received):
+                temporal_filter.apply(frame)
+                pack(frame.points)
+                latencies.append(time.perf_counter() - start)
+                start = received
+                if trace:
+                    current, peak = tracemalloc.get_traced_memory()
+                    allocations.append(peak - current)
+                    tracemalloc.reset_peak()
+        elapsed = time.perf_counter() - begin
+        if trace:
+            tracemalloc.stop()
+        return decoder.parser.lines + decoder.packets.packets, assembler.frames, elapsed, latencies, allocations
+
+
+def measure(variant, lines, args, first_canid, last_canid):
+    messages = variant.messages(lines, args.batch_lines, args.read_size)
+    filter_args = dict(mode=args.filter, window=args.window)
+    best = None
+    for _ in range(args.repeat):  # The fastest run is the least disturbed one
+        result = variant.run(messages, first_canid, last_canid, filter_args)
+        if best is None or result[2] < best[2]:
+            best = result
+    line_count, frames, elapsed, latencies, _ = best
+    allocations = variant.run(messages, first_canid, last_canid, filter_args, trace=True)[4]  # Tracing slows the run down
+    latencies = numpy.array(latencies) * 1e3
+    return {
+        'variant': variant.name,
+        'sensors': last_canid - first_canid + 1,
+        'lines': line_count,
+        'frames': frames,
+        'lines_per_s': line_count / elapsed,
+        'frames_per_s': frames / elapsed,
+        'latency_p50_ms': float(numpy.percentile(latencies, 50)) if len(latencies) else None,
+        'latency_p99_ms': float(numpy.percentile(latencies, 99)) if len(latencies) else None,
+        'alloc_bytes_per_frame': float(numpy.median(allocations)) if allocations else None,
+    }
+
+
+def recorded_lines(path, limit):
+    reader = LogReader(path)
+    lines = []
+    for _, line in lines_of(reader, iter(reader)):
+        lines.append(line.decode('ascii', 'replace') if isinstance(line, bytes) else line)
+        if len(lines) >= limit:
+            break
+    return lines
+
+
+VARIANTS = (Variant('ros1', pack_ros1), Variant('ros2', pack_ros2), Variant('ros2-serial', pack_ros2),
+            Variant('ros2-binary', pack_ros2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=500, help='frames of the synthetic streams')
+    parser.add_argument('--noise', type=float, default=0.0, help='fraction of truncated synthetic lines')
+    parser.add_argument('--log', help='benchmark this recorded log instead of synthetic streams')
+    parser.add_argument('--max-lines', type=int, default=1000000, help='lines taken from the log')
+    parser.add_argument('--first-canid', type=int, default=16)
+    parser.add_argument('--last-canid', type=int, default=20, help='last CAN ID of the recorded chain')
+    parser.add_argument('--batch-lines', type=int, default=100, help='lines per batched ros2 message')
+    parser.add_argument('--read-size', type=int, default=4096, help='bytes per serial read of ros2-serial and ros2-binary')
+    parser.add_argument('--filter', choices=MODES, default='none', help='temporal filter applied before packing')
+    parser.add_argument('--window', type=int, default=5, help='frames of the temporal filter')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.log:
+        streams = [(args.log, recorded_lines(args.log, args.max_lines), args.first_canid, args.last_canid)]
+    else:
+        streams = [('synthetic', make_lines(sensors, args.frames, args.first_canid, args.noise),
+                    args.first_canid, args.first_canid + sensors - 1) for sensors in SENSORS]
+
+    results = []
+    print(f"{'stream':>12} {'variant':>12} {'sensors':>7} {'lines/s':>12} {'frames/s':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'B/frame':>9}")
+    for variant in VARIANTS:
+        for name, lines, first_canid, last_canid in streams:
+            result = measure(variant, lines, args, first_canid, last_canid)
+            result['stream'] = name
+            results.append(result)
+            print(f"{os.path.basename(name):>12} {variant.name:>12} {result['sensors']:>7} "
+                  f"{result['lines_per_s']:>12,.0f} {result['frames_per_s']:>10,.1f} "
+                  f"{result['latency_p50_ms'] or 0:>8.3f} {result['latency_p99_ms'] or 0:>8.3f} "
+                  f"{result['alloc_bytes_per_frame'] or 0:>9,.0f}")
+
+    if args.output:
+        report = {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'machine': platform.machine(),
+            'arguments': vars(args),
+            'results': results,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import numpy
+
+from tof.binary import PACKET_SIZE, PacketDecoder, crc16, detect, encode
+from tof.binary import PACKET
+
+SAMPLES = [(16 + i // 32, (i % 32) // 8, i % 8, 1000 + i) for i in range(160)]
+
+
+def decoded(packets):
+    return [(int(p['canid']), int(p['pixel']), int(p['distance'])) for p in packets]
+
+
+def expected(samples):
+    return [(canid, row * 8 + col, distance) for canid, row, col, distance in samples]
+
+
+def test_crc_check_value():
+    packet = numpy.zeros(1, dtype=PACKET)
+    data = packet.view(numpy.uint8)
+    data[2:6] = numpy.frombuffer(b'1234', dtype=numpy.uint8)
+    # CRC-16/CCITT-FALSE of '1234', computed bytewise
+    crc = 0xFFFF
+    for byte in b'1234':
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+    assert int(crc16(packet)[0]) == crc
+
+
+def test_aligned_chunks():
+    decoder = PacketDecoder()
+    data = encode(SAMPLES)
+    packets = decoder.decode(data)
+    assert decoded(packets) == expected(SAMPLES)
+    assert (decoder.packets, decoder.crc_errors, decoder.discarded, decoder.pending) == (160, 0, 0, b'')
+
+
+def test_split_packets():
+    decoder = PacketDecoder()
+    data = encode(SAMPLES)
+    result = []
+    for start in range(0, len(data), 13):  # Chunks that cut packets apart
+        result += decoded(decoder.decode(data[start:start + 13]))
+    assert result == expected(SAMPLES)
+    assert decoder.crc_errors == 0 and decoder.discarded == 0
+
+
+def test_resync_after_corruption():
+    decoder = PacketDecoder()
+    data = bytearray(encode(SAMPLES))
+    data[5 * PACKET_SIZE + 4] ^= 0xFF  # Wrong distance in packet 5, its CRC fails
+    data[20 * PACKET_SIZE:20 * PACKET_SIZE] = b'\x00\xa5'  # Garbage between packets 19 and 20
+    result = []
+    for start in range(0, len(data), 100):
+        result += decoded(decoder.decode(bytes(data[start:start + 100])))
+    assert result == expected(SAMPLES[:5] + SAMPLES[6:])
+    assert decoder.crc_errors == 1
+    assert decoder.discarded == PACKET_SIZE + 2
+
+
+def test_sync_word_inside_a_packet():
+    decoder = PacketDecoder()
+    samples = [(0xA5, 0x5A // 8, 0x5A % 8, 0x5AA5)] * 4  # Sync bytes in every field
+    data = b'\x01' + encode(samples)  # Unaligned start takes the slow path
+    assert decoded(decoder.decode(data)) == expected(samples)
+    assert decoder.crc_errors == 0 and decoder.discarded == 1
+
+
+def test_detect():
+    lines = b''.join(b'16:03 1234\n' for _ in range(5))
+    assert detect(encode(SAMPLES[:5])) == 'binary'
+    assert detect(lines) == 'ascii'
+    assert detect(encode(SAMPLES[:1])) is None
+    assert detect(b'16:0') is None
+    assert detect(b'\n\n\n\n') is None
+
+
+def test_detect_newlines_in_packets():
+    data = encode([(16, 1, 2, 0x0A0A), (16, 1, 2, 0x0A0A)])  # Pixel 10 and the distance are newline bytes
+    assert data.count(b'\n') >= 3
+    assert detect(data) is None
+    assert detect(data + encode(SAMPLES[:1])) == 'binary'
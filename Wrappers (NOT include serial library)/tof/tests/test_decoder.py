@@ -0,0 +1,71 @@
+import pytest
+
+from tof.binary import encode
+from tof.decoder import DETECT_LIMIT, Decoder, decode_bytes
+
+SAMPLES = [(16 + i // 32, (i % 32) // 8, i % 8, 1000 + i) for i in range(160)] * 3
+
+
+def chunks(data, size=1000):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def lines_of(samples):
+    return ''.join('{}:{}{} {}\n'.format(*sample) for sample in samples).encode('ascii')
+
+
+@pytest.mark.parametrize('protocol', ['binary', 'auto'])
+def test_binary_frames(protocol):
+    decoder = Decoder(16, 20, timeout=0, protocol=protocol)
+    frames = [frame.copy() for frame in decode_bytes(chunks(encode(SAMPLES)), decoder)]
+    assert decoder.protocol == 'binary'
+    assert [frame.complete for frame in frames] == [True] * 3
+    assert frames[0].points[7, 0] == pytest.approx(1.007)
+
+
+@pytest.mark.parametrize('protocol', ['ascii', 'auto'])
+def test_ascii_frames(protocol):
+    decoder = Decoder(16, 20, timeout=0, protocol=protocol)
+    frames = list(decode_bytes(chunks(lines_of(SAMPLES), 7), decoder))
+    assert decoder.protocol == 'ascii'
+    assert len(frames) == 3
+
+
+def test_auto_waits_and_bounds_the_sample():
+    decoder = Decoder(16, 20, timeout=0, protocol='auto')
+    for _ in range(3):
+        assert list(decoder.feed_bytes(b'\x00' * DETECT_LIMIT)) == []
+    assert decoder.protocol == 'auto'
+    assert decoder.counters()['discarded_bytes'] == 2 * DETECT_LIMIT
+    frames = list(decoder.feed_bytes(encode(SAMPLES)))
+    assert decoder.protocol == 'binary' and len(frames) == 3
+    assert decoder.counters()['discarded_bytes'] == 3 * DETECT_LIMIT  # The zeros kept for detection
+
+
+def test_auto_newlines_in_the_first_packets():
+    data = encode([(16, 1, 2, 0x0A0A)] * 2 + SAMPLES)
+    decoder = Decoder(16, 20, timeout=0, protocol='auto')
+    frames = [frame.copy() for frame in decode_bytes(chunks(data, 16), decoder)]
+    assert decoder.protocol == 'binary'
+    assert [frame.count for frame in frames[:1]] == [1]  # The repeated pixel 10 before the scans
+    assert [frame.complete for frame in frames[1:]] == [True] * 3
+
+
+def test_detect_returns_the_kept_bytes():
+    data = lines_of(SAMPLES[:10])
+    decoder = Decoder(16, 20, timeout=0, protocol='auto')
+    returned = [decoder.detect(chunk) for chunk in chunks(data, 7)]
+    assert returned[0] == b'' and decoder.protocol == 'ascii'
+    assert b''.join(returned) == data
+
+
+def test_binary_unknown_pixels_are_rejected():
+    decoder = Decoder(16, 16, timeout=0, protocol='binary')
+    list(decoder.feed_bytes(encode([(16, 0, 0, 100), (17, 0, 0, 100), (40, 1, 1, 100)])))
+    assert decoder.counters()['unknown_pixel'] == 2
+    assert decoder.parser.rejects_by_id == {'other': 2}
+
+
+def test_unknown_protocol():
+    with pytest.raises(ValueError):
+        Decoder(protocol='hex')
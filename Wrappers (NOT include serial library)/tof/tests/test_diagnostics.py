@@ -0,0 +1,29 @@
+from tof.decoder import Decoder
+from tof.diagnostics import ERROR, OK, WARN, SensorDiagnostics
+
+
+def scan_lines(canid, pixels=range(32), distance=500):
+    return ['{}:{}{} {}'.format(canid, pixel // 8, pixel % 8, distance) for pixel in pixels]
+
+
+def test_levels():
+    """Sensor 16 is healthy, 17 misses pixels, 18 has rejected lines and 19 never reported."""
+    decoder = Decoder(16, 19, timeout=0)
+    diagnostics = SensorDiagnostics(decoder, min_completeness=0.9, stale_timeout=1.0)
+    diagnostics.report(0.0)
+    lines = scan_lines(16) + scan_lines(17, range(28)) + scan_lines(18) + ['18:47 500']  # Row 4 does not exist
+    for _ in decoder.feed_lines(lines, 0.5):
+        pass
+    diagnostics.add(decoder.flush())
+    statuses = diagnostics.report(1.0)
+    assert [status.canid for status in statuses] == [16, 17, 18, 19]
+    assert [status.level for status in statuses] == [OK, WARN, WARN, ERROR]
+    assert [status.rejected for status in statuses] == [0, 0, 1, 0]
+    assert statuses[1].completeness == 28 / 32.0
+    assert statuses[0].rate == 1.0
+    assert statuses[3].last_seen is None
+
+    statuses = diagnostics.report(1.6)  # The rejects were reported, but no frame for more than stale_timeout
+    assert [status.level for status in statuses] == [ERROR] * 4
+    assert statuses[0].message.startswith("No data for 1.1 s")
+    assert [status.rejected for status in statuses] == [0] * 4
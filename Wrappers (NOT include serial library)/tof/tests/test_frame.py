@@ -0,0 +1,129 @@
+import numpy
+
+from tof.frame import FrameAssembler
+from tof.geometry import CoordinateTable, DISTANCE_SCALE
+
+SIZE = 64  # CAN ID 16 and 17
+
+
+def make_assembler(timeout=0):
+    return FrameAssembler(CoordinateTable(16, 17), timeout)
+
+
+def feed(assembler, samples):
+    """Add (index, distance, stamp) samples, return copies of the emitted frames."""
+    frames = []
+    for index, distance, stamp in samples:
+        frame = assembler.add(index, distance, stamp)
+        if frame is not None:
+            frames.append(frame.copy())
+    return frames
+
+
+def scan(number, indices=range(SIZE), stamp=0.0):
+    """Samples of one scan, the distance encodes the scan and the pixel."""
+    return [(index, number * 1000 + index, stamp) for index in indices]
+
+
+def scans_of(frame):
+    """Return the scan numbers the filled pixels of a frame came from."""
+    distances = numpy.rint(frame.points[:, 0] / DISTANCE_SCALE)
+    return set((distances[~numpy.isnan(distances)] // 1000).astype(int).tolist())
+
+
+def test_complete_scans():
+    assembler = make_assembler()
+    frames = feed(assembler, scan(1) + scan(2))
+    assert [frame.complete for frame in frames] == [True, True]
+    assert [scans_of(frame) for frame in frames] == [{1}, {2}]
+    assert assembler.torn == 0
+
+
+def test_dropped_pixels_tear_only_their_frame():
+    assembler = make_assembler()
+    frames = feed(assembler, scan(1, [i for i in range(SIZE) if i not in (0, 7, 63)]) + scan(2) + scan(3))
+    assert [frame.count for frame in frames] == [SIZE - 3, SIZE, SIZE]
+    assert numpy.isnan(frames[0].points[[0, 7, 63], 0]).all()
+    assert [scans_of(frame) for frame in frames] == [{1}, {2}, {3}]
+    assert assembler.torn == 1
+
+
+def test_adjacent_duplicate_is_ignored():
+    assembler = make_assembler()
+    frames = feed(assembler, scan(1, [0, 1, 2, 2] + list(range(3, SIZE))) + scan(2))
+    assert [frame.complete for frame in frames] == [True, True]
+    assert assembler.duplicates == 1
+
+
+def test_repeated_line_does_not_mix_scans():
+    """Line 2 repeated at position 5 of the first scan must not shift the later frames."""
+    assembler = make_assembler()
+    first = scan(1, [0, 1, 2, 3, 4, 2] + list(range(5, SIZE)))
+    frames = feed(assembler, first + sum((scan(number) for number in range(2, 7)), []))
+    assert all(len(scans_of(frame)) == 1 for frame in frames)
+    assert [frame.complete for frame in frames[-5:]] == [True] * 5
+    assert [scans_of(frame) for frame in frames[-5:]] == [{2}, {3}, {4}, {5}, {6}]
+    assert assembler.torn == len(frames) - 5
+
+
+def test_lost_scan_start_realigns():
+    assembler = make_assembler()
+    frames = feed(assembler, scan(1, range(2, SIZE)) + scan(2) + scan(3))
+    assert [scans_of(frame) for frame in frames] == [{1}, {2}, {3}]
+    assert [frame.complete for frame in frames] == [False, True, True]
+
+
+def test_timeout_and_late_pixels():
+    assembler = make_assembler(timeout=0.5)
+    frames = feed(assembler, scan(1, range(40), stamp=0.0))
+    assert frames == []
+    frame = assembler.poll(1.0)
+    assert frame.timed_out and frame.count == 40
+    assert feed(assembler, scan(1, range(40, SIZE), stamp=1.0)) == []  # Stragglers of the timed out frame
+    assert assembler.late == SIZE - 40
+    frames = feed(assembler, scan(2, stamp=1.1))
+    assert [scans_of(frame) for frame in frames] == [{2}]
+    assert assembler.timeouts == 1
+
+
+def test_timeout_of_a_scan_started_midway():
+    assembler = make_assembler(timeout=0.5)
+    assert feed(assembler, scan(1, range(10, 40), stamp=0.0)) == []  # The start of the scan was lost
+    frame = assembler.poll(1.0)
+    assert frame.timed_out and frame.count == 30
+    frames = feed(assembler, scan(2, stamp=1.0))  # Pixels 0..9 were missing too, but start the next scan
+    assert [scans_of(frame) for frame in frames] == [{2}]
+    assert frames[0].complete
+    assert assembler.late == 0
+
+
+def interleaved(number):
+    """Samples of one scan with the lines of the two sensors alternating, the second sensor first."""
+    half = SIZE // 2
+    return scan(number, [index for pixel in range(half) for index in (half + pixel, pixel)])
+
+
+def test_interleaved_sensors_give_whole_frames():
+    assembler = make_assembler()
+    frames = feed(assembler, interleaved(1) + interleaved(2) + interleaved(3))
+    assert [frame.complete for frame in frames] == [True, True, True]
+    assert [scans_of(frame) for frame in frames] == [{1}, {2}, {3}]
+    assert assembler.torn == 0 and assembler.duplicates == 0
+
+
+def test_interleaved_sensor_wrap_starts_the_next_frame():
+    """Sensor 0 loses its last line, its wrap into scan 2 still closes scan 1."""
+    assembler = make_assembler()
+    first = [sample for sample in interleaved(1) if sample[0] != SIZE // 2 - 1]
+    frames = feed(assembler, first + interleaved(2))
+    assert [scans_of(frame) for frame in frames] == [{1}, {2}]
+    assert [frame.count for frame in frames] == [SIZE - 1, SIZE]
+
+
+def test_repeated_last_line_is_a_duplicate():
+    """A repeat of the line that completed a frame must not start the next one."""
+    assembler = make_assembler()
+    frames = feed(assembler, scan(1) + [(SIZE - 1, 1000 + SIZE - 1, 0.0)] + sum((scan(number) for number in range(2, 8)), []))
+    assert [scans_of(frame) for frame in frames] == [{number} for number in range(1, 8)]
+    assert all(frame.complete for frame in frames)
+    assert (assembler.duplicates, assembler.torn) == (1, 0)
@@ -0,0 +1,27 @@
+import math
+
+from tof.latency import EDGES_MS, STAGES, LatencyHistogram
+
+
+def test_stages_and_bin_edges():
+    histogram = LatencyHistogram(edges_ms=(1, 10))
+    histogram.record(0.0, 0.001, 0.001, 0.0105)  # acquire 1 ms, read_to_parse 0, parse_to_publish 9.5 ms, total 10.5 ms
+    counts = histogram.counts.tolist()
+    assert counts[STAGES.index('acquire')] == [1, 0, 0]  # An edge belongs to the bin it closes
+    assert counts[STAGES.index('read_to_parse')] == [1, 0, 0]
+    assert counts[STAGES.index('parse_to_publish')] == [0, 1, 0]
+    assert counts[STAGES.index('total')] == [0, 0, 1]  # Beyond the last edge is the open bin
+    assert histogram.frames() == 1
+
+
+def test_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile('total', 50) is None
+    for total_ms in [0.05] * 50 + [3] * 40 + [5000] * 10:
+        histogram.record(0.0, 0.0, 0.0, total_ms / 1e3)
+    assert histogram.percentile('total', 50) == EDGES_MS[0]
+    assert histogram.percentile('total', 90) == 5
+    assert math.isinf(histogram.percentile('total', 99))
+    assert histogram.percentile('acquire', 99) == EDGES_MS[0]
+    histogram.reset()
+    assert histogram.frames() == 0
@@ -0,0 +1,97 @@
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from tof.line_splitter import LineSplitter
+
+HEADER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'ROS2', 's50_tof_wrappers', 'src',
+                          'raw_tof', 'src')
+CHUNK = 97  # Bytes per write, so lines are cut apart
+MAX_LINE = 24
+
+HARNESS = r'''
+#include <cstdio>
+#include <string>
+#include "line_splitter.h"
+
+int main() {
+    LineSplitter splitter(256, %d);
+    char chunk[%d];
+    std::string line;
+    size_t size;
+    while ((size = fread(chunk, 1, sizeof(chunk), stdin)) > 0) {
+        for (size_t done = 0; done < size;) {
+            done += splitter.write(chunk + done, size - done);
+            while (splitter.next(line)) {
+                fwrite(line.data(), 1, line.size(), stdout);
+                fputc('\n', stdout);
+            }
+        }
+    }
+    fprintf(stderr, "%%llu %%llu %%llu", (unsigned long long)splitter.bytes(),
+            (unsigned long long)splitter.lines(), (unsigned long long)splitter.discarded());
+    return 0;
+}
+''' % (MAX_LINE, CHUNK)
+
+
+def noisy_stream(seed=0):
+    """Lines with garbage bytes, overlong lines and lost newlines."""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(2000):
+        kind = rng.random()
+        if kind < 0.7:
+            parts.append('{}:{}{} {}\r\n'.format(rng.randint(16, 20), rng.randint(0, 3), rng.randint(0, 7),
+                                                rng.randint(30, 4000)).encode('ascii'))
+        elif kind < 0.8:
+            parts.append(bytes(bytearray(rng.randint(0, 255) for _ in range(rng.randint(1, 12)))) + b'\n')
+        elif kind < 0.9:
+            parts.append(b'16:03 ' + b'9' * rng.randint(MAX_LINE - 8, MAX_LINE * 3) + b'\n')  # Around the limit
+        else:
+            parts.append(b'17:12 55')  # Lost newline, merges with the next line
+    return b''.join(parts) + b'\n'
+
+
+@pytest.fixture(scope='module')
+def harness(tmp_path_factory):
+    compiler = shutil.which('c++') or shutil.which('g++')
+    if compiler is None or not os.path.exists(os.path.join(HEADER_DIR, 'line_splitter.h')):
+        pytest.skip('needs a C++ compiler and the raw_tof sources')
+    directory = tmp_path_factory.mktemp('splitter')
+    source = directory / 'harness.cpp'
+    source.write_text(HARNESS)
+    binary = str(directory / 'harness')
+    subprocess.check_call([compiler, '-std=c++14', '-O2', '-I', HEADER_DIR, str(source), '-o', binary])
+    return binary
+
+
+def test_matches_the_cpp_splitter(harness):
+    data = noisy_stream()
+    result = subprocess.run([harness], input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    cpp_lines = result.stdout.split(b'\n')[:-1]
+    cpp_counters = [int(value) for value in result.stderr.split()]
+
+    splitter = LineSplitter(MAX_LINE)
+    lines = []
+    for start in range(0, len(data), CHUNK):
+        lines += splitter.split(data[start:start + CHUNK])
+    assert lines == cpp_lines
+    assert [splitter.bytes, splitter.lines, splitter.discarded] == cpp_counters
+
+
+def test_incomplete_line_waits():
+    splitter = LineSplitter()
+    assert splitter.split(b'16:03 12') == []
+    assert splitter.split(b'34\n17:') == [b'16:03 1234']
+    assert splitter.split(b'00 1\n') == [b'17:00 1']
+
+
+def test_overlong_line_is_skipped_up_to_the_newline():
+    splitter = LineSplitter(8)
+    assert splitter.split(b'x' * 20) == []
+    assert splitter.split(b'yyy\n16:03 1\n') == [b'16:03 1']
+    assert splitter.discarded == 24
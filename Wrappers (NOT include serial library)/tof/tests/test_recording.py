@@ -0,0 +1,55 @@
+import pytest
+
+from tof.recording import KIND_BYTES, KIND_LINES, LogReader, LogWriter
+
+
+def test_round_trip_and_append(tmp_path):
+    path = str(tmp_path / 'capture.toflog')
+    with LogWriter(path, KIND_LINES) as writer:
+        writer.write(b'16:00 100', 1)
+        writer.write(b'', 2)
+    with LogWriter(path, KIND_LINES) as writer:  # Appends to the existing log
+        writer.write(b'16:01 200', 3)
+    reader = LogReader(path)
+    assert reader.kind == KIND_LINES
+    assert list(reader) == [(1, b'16:00 100'), (2, b''), (3, b'16:01 200')]
+
+
+def test_cut_off_last_record(tmp_path):
+    path = str(tmp_path / 'capture.toflog')
+    with LogWriter(path, KIND_BYTES) as writer:
+        writer.write(b'first chunk', 1)
+        writer.write(b'second chunk', 2)
+    with open(path, 'rb') as file:
+        data = file.read()
+    for cut in (1, 5, len(b'second chunk') + 5):  # Inside the payload and inside the record header
+        with open(path, 'wb') as file:
+            file.write(data[:-cut])
+        assert list(LogReader(path)) == [(1, b'first chunk')]
+
+
+def test_kind_mismatch_and_bad_files(tmp_path):
+    path = str(tmp_path / 'capture.toflog')
+    LogWriter(path, KIND_BYTES).close()
+    with pytest.raises(ValueError):
+        LogWriter(path, KIND_LINES)
+    other = tmp_path / 'other.toflog'
+    other.write_bytes(b'NOTALOG!')
+    with pytest.raises(ValueError):
+        LogReader(str(other))
+
+
+def test_append_after_cut_off_record(tmp_path):
+    path = str(tmp_path / 'capture.toflog')
+    with LogWriter(path, KIND_BYTES) as writer:
+        for stamp in range(3):
+            writer.write(b'chunk %d' % stamp, stamp)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:-3])  # Killed while writing the payload of the third record
+    with LogWriter(path, KIND_BYTES) as writer:
+        for stamp in range(10, 15):
+            writer.write(b'chunk %d' % stamp, stamp)
+    expected = [(stamp, b'chunk %d' % stamp) for stamp in [0, 1] + list(range(10, 15))]
+    assert list(LogReader(path)) == expected
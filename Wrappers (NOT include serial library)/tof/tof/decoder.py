@@ -0,0 +1,171 @@
+"""Streaming decoder of the raw ToF stream.
+
+Decoder chains the stages of the pointcloud nodes: raw bytes are split into
+lines (LineSplitter), the lines are parsed (LineParser), looked up in the
+pixel table (CoordinateTable) and assembled into frames (FrameAssembler).
+Raw bytes may also be binary packets (PacketDecoder), which skip the line
+stages; with protocol 'auto' the format is detected from the first bytes.
+The feed methods return generators of the frames completed by their input,
+so a stream of any length is decoded with bounded memory:
+
+    decoder = Decoder(16, 20)
+    for chunk in chunks:
+        for frame in decoder.feed_bytes(chunk):
+            use(frame.points, frame.filled, frame.first_stamp)
+
+The input is only decoded while the generator is iterated. A yielded Frame
+is reset when the decoder emits the next one, so use it before advancing
+the generator or keep a Frame.copy(). decode_bytes(), decode_lines() and decode_log() decode a
+whole stream and also yield the frame that is still open at its end.
+"""
+import numpy
+
+from .binary import PacketDecoder, detect
+from .frame import FrameAssembler
+from .geometry import CoordinateTable, PIXELS_PER_SENSOR
+from .line_parser import LineParser, UNKNOWN_PIXEL
+from .line_splitter import LineSplitter
+from .recording import KIND_BYTES, LogReader
+
+First_CANID = 16    # Define the CAN ID of first Tof sensor
+Last_CANID = 20     # Define the CAN ID of last Tof sensor
+Frame_timeout = 0.5  # Define the time in seconds after which an incomplete frame is emitted
+PROTOCOLS = ('ascii', 'binary', 'auto')  # Formats of the raw bytes
+DETECT_LIMIT = 4096  # Bytes kept to detect the format, older ones are discarded
+
+
+class Decoder(object):
+    """Decode raw bytes or lines of one sensor chain into frames."""
+
+    def __init__(self, first_canid=First_CANID, last_canid=Last_CANID, timeout=Frame_timeout,
+                 max_line_length=256, protocol='ascii'):
+        if protocol not in PROTOCOLS:
+            raise ValueError("Unknown protocol '{}', expected one of {}".format(protocol, ', '.join(PROTOCOLS)))
+        self.table = CoordinateTable(first_canid, last_canid)
+        self.parser = LineParser(first_canid, last_canid)
+        self.splitter = LineSplitter(max_line_length)
+        self.packets = PacketDecoder()
+        self.assembler = FrameAssembler(self.table, timeout)
+        self.protocol = protocol  # 'auto' until the format of the bytes is detected
+        self._sample = b''  # Bytes read while detecting
+
+    def configure(self, first_canid, last_canid, timeout):
+        """Change the chain and the frame timeout.
+
+        The frame being assembled is dropped if the chain changes. Raises
+        ValueError, and keeps the old configuration, for an invalid chain.
+        """
+        if not self.table.matches(first_canid, last_canid):  # Only rebuild the table when the chain changes
+            self.table = CoordinateTable(first_canid, last_canid)
+            self.assembler = FrameAssembler(self.table, timeout)
+            self.parser.set_chain(first_canid, last_canid)
+        self.assembler.timeout = timeout
+
+    def feed_line(self, line, stamp=None):
+        """Decode one line, text or bytes, and return the Frame it completed or tore, or None."""
+        sample = self.parser.parse(line)  # Rejects are counted by the parser
+        if sample is None:
+            return None
+        device_id, row, col, distance = sample
+        index = self.table.index(device_id, row, col)  # Look up the pixel in the chain
+        if index < 0:
+            self.parser.reject(UNKNOWN_PIXEL, device_id)
+            return None
+        return self.assembler.add(index, distance, stamp)  # Write the distance into the frame
+
+    def feed_lines(self, lines, stamp=None):
+        """Yield the frames completed by the lines, received at stamp (default: now)."""
+        for line in lines:
+            frame = self.feed_line(line, stamp)
+            if frame is not None:
+                yield frame
+
+    def feed_packets(self, packets, stamp=None):
+        """Yield the frames completed by a PACKET array of binary samples."""
+        table = self.table
+        canids = packets['canid'].astype(numpy.int64)
+        pixels = packets['pixel'].astype(numpy.int64)
+        known = (canids >= table.first_canid) & (canids <= table.last_canid) & (pixels < PIXELS_PER_SENSOR)
+        if not known.all():
+            for device_id in canids[~known].tolist():
+                self.parser.reject(UNKNOWN_PIXEL, device_id)
+        indices = (canids[known] - table.first_canid) * PIXELS_PER_SENSOR + pixels[known]  # Row-major like table.index()
+        add = self.assembler.add
+        for index, distance in zip(indices.tolist(), packets['distance'][known].tolist()):
+            frame = add(index, distance, stamp)
+            if frame is not None:
+                yield frame
+
+    def detect(self, data):
+        """Return the bytes to decode for a chunk of raw bytes.
+
+        With protocol 'auto' the bytes are kept until their format is
+        detected, which sets protocol; then all kept bytes are returned at
+        once, before that b''. Otherwise data is returned unchanged.
+        """
+        if self.protocol != 'auto':
+            return data
+        self._sample += data
+        protocol = detect(self._sample)
+        if protocol is None:
+            if len(self._sample) > DETECT_LIMIT:
+                self.splitter.discarded += len(self._sample) - DETECT_LIMIT
+                self._sample = self._sample[-DETECT_LIMIT:]
+            return b''
+        data, self._sample = self._sample, b''
+        self.protocol = protocol
+        return data
+
+    def feed_bytes(self, data, stamp=None):
+        """Yield the frames completed by a chunk of raw bytes; incomplete lines or packets wait for the next chunk."""
+        data = self.detect(data)
+        if self.protocol == 'binary':
+            return self.feed_packets(self.packets.decode(data), stamp)
+        return self.feed_lines(self.splitter.split(data), stamp)  # No lines while the format is detected
+
+    def poll(self, stamp=None):
+        """Return the current frame if it is older than the timeout, else None."""
+        return self.assembler.poll(stamp)
+
+    def flush(self):
+        """Return the frame being assembled, or None if it is empty."""
+        return self.assembler.flush()
+
+    def counters(self):
+        """Return the problem counters of all stages by name."""
+        counters = dict(self.parser.rejects)
+        counters.update(torn=self.assembler.torn, duplicates=self.assembler.duplicates,
+                        late=self.assembler.late, discarded_bytes=self.splitter.discarded + self.packets.discarded,
+                        crc_errors=self.packets.crc_errors)
+        return counters
+
+
+def _decode(decoder, frames):
+    for frame in frames:
+        yield frame
+    frame = decoder.flush()
+    if frame is not None:
+        yield frame
+
+
+def decode_bytes(chunks, decoder=None):
+    """Yield the frames of an iterable of raw byte chunks."""
+    decoder = decoder or Decoder()
+    return _decode(decoder, (frame for chunk in chunks for frame in decoder.feed_bytes(chunk)))
+
+
+def decode_lines(lines, decoder=None):
+    """Yield the frames of an iterable of lines."""
+    decoder = decoder or Decoder()
+    return _decode(decoder, decoder.feed_lines(lines))
+
+
+def decode_log(path, decoder=None):
+    """Yield the frames of a log written by the record tool, timed by its receive stamps."""
+    decoder = decoder or Decoder()
+    reader = LogReader(path)
+    if reader.kind == KIND_BYTES:
+        frames = (frame for stamp, payload in reader for frame in decoder.feed_bytes(payload, stamp / 1e9))
+    else:
+        frames = (frame for stamp, line in reader for frame in decoder.feed_lines((line,), stamp / 1e9))
+    return _decode(decoder, frames)
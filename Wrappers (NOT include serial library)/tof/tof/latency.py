@@ -0,0 +1,48 @@
+"""Latency histogram of the decode pipeline.
+
+Every published frame contributes one sample to each stage:
+
+    acquire           first to last line of the frame read from the port
+    read_to_parse     last line read to the frame emitted by the decoder
+    parse_to_publish  frame emitted to its cloud published
+    total             first line read to the cloud published
+
+Samples are counted in fixed bins, so recording costs the same for any
+number of frames and the counts of a period can be published as they are.
+"""
+import bisect
+
+import numpy
+
+STAGES = ('acquire', 'read_to_parse', 'parse_to_publish', 'total')
+EDGES_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # Upper bin edges, the last bin is open
+
+
+class LatencyHistogram(object):
+    """Count the stage latencies of published frames in bins of EDGES_MS."""
+
+    def __init__(self, edges_ms=EDGES_MS):
+        self.edges_ms = tuple(edges_ms)
+        self._edges = [edge / 1e3 for edge in self.edges_ms]  # Seconds, like the stamps
+        self.counts = numpy.zeros((len(STAGES), len(self._edges) + 1), dtype=numpy.int64)
+
+    def record(self, first_read, last_read, parsed, published):
+        """Add one frame from the monotonic times of its stages."""
+        latencies = (last_read - first_read, parsed - last_read, published - parsed, published - first_read)
+        for stage, latency in enumerate(latencies):
+            self.counts[stage, bisect.bisect_left(self._edges, latency)] += 1
+
+    def frames(self):
+        return int(self.counts[0].sum())
+
+    def percentile(self, stage, q):
+        """Return the upper bin edge in ms below which q percent of the stage fall, inf for the open bin."""
+        counts = self.counts[STAGES.index(stage)]
+        total = counts.sum()
+        if not total:
+            return None
+        index = int(numpy.searchsorted(numpy.cumsum(counts), total * q / 100.0))
+        return self.edges_ms[index] if index < len(self.edges_ms) else float('inf')
+
+    def reset(self):
+        self.counts[...] = 0
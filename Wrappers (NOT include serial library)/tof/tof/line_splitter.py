@@ -0,0 +1,57 @@
+"""Bounded line splitter for the raw byte stream of the sensor chain.
+
+This is the Python counterpart of the LineSplitter of the raw_tof node and
+follows the same rules: an incomplete line is kept for the next chunk, a
+line longer than max_line_length or containing bytes that are neither
+printable ASCII nor tab or carriage return is discarded up to the next
+newline, and the number of bytes, lines and discarded bytes is counted.
+The incomplete line is the only state kept between chunks, so the buffer
+stays bounded when the stream loses its newlines. Chunks are split with
+bytes methods, which is faster in Python than scanning a ring buffer.
+"""
+
+_PRINTABLE = bytes(bytearray(range(0x20, 0x7f))) + b'\t\r'  # Bytes allowed in a line
+
+
+class LineSplitter(object):
+    """Split chunks of bytes into complete lines without their newline."""
+
+    def __init__(self, max_line_length=256):
+        self.max_line_length = max_line_length
+        self.bytes = 0  # Bytes fed
+        self.lines = 0  # Lines returned
+        self.discarded = 0  # Bytes of dropped lines, newlines included
+        self._pending = b''  # Incomplete line of the previous chunk
+        self._skipping = False  # Dropping bytes up to the next newline
+
+    def split(self, data):
+        """Return the list of lines completed by data."""
+        self.bytes += len(data)
+        buffer = self._pending + data if self._pending else data
+        last = buffer.rfind(b'\n')  # End of the last complete line
+        if last < 0:
+            lines, rest = [], buffer
+        else:
+            lines, rest = buffer[:last].split(b'\n'), buffer[last + 1:]
+            if self._skipping:  # The first line is the tail of a dropped one
+                self.discarded += len(lines.pop(0)) + 1
+                self._skipping = False
+            if lines and (max(map(len, lines)) > self.max_line_length
+                          or buffer[:last].translate(None, _PRINTABLE)):
+                lines = self._drop_garbage(lines)  # Checked per line only if the chunk has a bad one
+        if self._skipping or len(rest) > self.max_line_length:
+            self.discarded += len(rest)
+            rest = b''
+            self._skipping = True
+        self._pending = rest
+        self.lines += len(lines)
+        return lines
+
+    def _drop_garbage(self, lines):
+        kept = []
+        for line in lines:
+            if len(line) > self.max_line_length or line.translate(None, _PRINTABLE):
+                self.discarded += len(line) + 1
+            else:
+                kept.append(line)
+        return kept
@@ -0,0 +1,111 @@
+"""Merging the frames of several daisy chains into one cloud.
+
+Each chain is read and assembled on its own. FrameMerger copies the latest
+frame of every chain into the chain's rows of one float32 (N, 3) buffer,
+shifted by the position of the chain on the robot, and emits the merged
+frame once every chain has delivered a frame, or timeout seconds after the
+first of them. A chain that delivers again before the others replaces its
+pending frame, so a faster chain does not cut the merge short. Frames
+merged together were thus received within one timeout of each other; the
+rows of a chain that did not deliver in time have a NaN x. With a timeout
+of 0 a merge waits for every chain.
+"""
+import collections
+
+import numpy
+
+try:
+    from time import monotonic
+except ImportError:  # Python 2
+    from time import time as monotonic
+
+
+_Added = collections.namedtuple('_Added', 'first_stamp last_stamp complete rejected')  # The chain frame is reused by its decoder
+
+
+class MergedFrame(object):
+    """Points of all chains and the receive time of their first and last sample."""
+
+    def __init__(self, points, first_stamp, last_stamp, chains, complete, rejected, sequence):
+        self.points = points
+        self.first_stamp = first_stamp
+        self.last_stamp = last_stamp
+        self.chains = chains  # Number of chains that delivered a frame
+        self.complete = complete  # All chains delivered complete frames
+        self.rejected = rejected
+        self.sequence = sequence
+
+    @property
+    def dense(self):
+        """True if every point has a distance."""
+        return self.complete and not self.rejected
+
+
+class FrameMerger(object):
+    """Merge frames of chains with the given numbers of pixels.
+
+    offsets is a (chains, 3) sequence of the x, y, z position of every chain
+    in the merged cloud, zero by default. Counters:
+        merged    emitted merged frames
+        partial   merged frames that lack the frame of at least one chain
+        replaced  chain frames replaced by a newer frame of the same chain before merging
+    """
+
+    def __init__(self, sizes, timeout=0.5, offsets=None):
+        self.timeout = timeout
+        bounds = numpy.cumsum([0] + list(sizes))
+        self.rows = [slice(begin, end) for begin, end in zip(bounds[:-1], bounds[1:])]
+        self.offsets = numpy.zeros((len(sizes), 3), dtype=numpy.float32)
+        if offsets is not None:
+            self.offsets[...] = offsets
+        self.points = numpy.full((bounds[-1], 3), numpy.nan, dtype=numpy.float32)
+        self.frames = [None] * len(sizes)  # Stamps and state of the chain frames in the next merge
+        self.first_stamp = None  # Receive time of the first frame added to the next merge
+        self.merged = 0
+        self.partial = 0
+        self.replaced = 0
+
+    def add(self, chain, frame):
+        """Add the frame of a chain, return the MergedFrame this completed or timed out, or None.
+
+        A chain that delivers again before the others replaces its pending
+        frame, the merge still waits for the other chains.
+        """
+        done = self.poll(frame.last_stamp)
+        if self.frames[chain] is not None:
+            self.replaced += 1
+        numpy.add(frame.points, self.offsets[chain], out=self.points[self.rows[chain]])
+        self.frames[chain] = _Added(frame.first_stamp, frame.last_stamp, frame.complete, frame.rejected)
+        if self.first_stamp is None:
+            self.first_stamp = frame.first_stamp
+        if all(added is not None for added in self.frames):
+            done = self._emit()
+        return done
+
+    def poll(self, stamp=None):
+        """Emit the merged frame if its first frame is older than the timeout."""
+        if self.first_stamp is None or self.timeout <= 0:
+            return None
+        if stamp is None:
+            stamp = monotonic()
+        if stamp - self.first_stamp < self.timeout:
+            return None
+        return self._emit()
+
+    def _emit(self):
+        frames = [frame for frame in self.frames if frame is not None]
+        complete = len(frames) == len(self.frames) and all(frame.complete for frame in frames)
+        self.merged += 1
+        if len(frames) < len(self.frames):
+            self.partial += 1
+            for chain, frame in enumerate(self.frames):
+                if frame is None:
+                    self.points[self.rows[chain], 0] = numpy.nan
+        merged = MergedFrame(
+            self.points.copy(),  # The buffer is refilled by the next frames
+            min(frame.first_stamp for frame in frames),
+            max(frame.last_stamp for frame in frames),
+            len(frames), complete, sum(frame.rejected for frame in frames), self.merged)
+        self.frames = [None] * len(self.frames)
+        self.first_stamp = None
+        return merged
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Record the raw ToF stream into an append-only binary log.
+
+The raw bytes are read from the serial port, or the lines published on the
+raw_tof topic are recorded, each with its monotonic receive time. Stop the
+recording with Ctrl-C; recording into an existing log appends to it.
+
+    $ tof-record capture.toflog --port /dev/ttyUSB1
+    $ tof-record capture.toflog --topic raw_tof
+"""
+import argparse
+import os
+import select
+import sys
+import time
+
+from tof.recording import KIND_BYTES, KIND_LINES, LogWriter
+from tof.serial_port import open_serial
+
+Flush_interval = 1.0  # Define the seconds between flushes of the log to disk
+
+
+def record_serial(writer, port, baudrate, read_size=65536):
+    fd = open_serial(port, baudrate)
+    flushed = time.monotonic()
+    try:
+        while True:
+            readable, _, _ = select.select([fd], [], [], Flush_interval)
+            if readable:
+                try:
+                    data = os.read(fd, read_size)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    return  # End of file
+                writer.write(data)  # Stamped right after the read
+            if time.monotonic() - flushed >= Flush_interval:
+                writer.flush()
+                flushed = time.monotonic()
+    finally:
+        os.close(fd)
+
+
+def record_topic(writer, topic, reliability='best_effort'):
+    import rclpy  # Only needed to record from a topic, ROS2 only
+    from rclpy.qos import HistoryPolicy, QoSProfile, ReliabilityPolicy
+    from std_msgs.msg import String
+
+    def callback(msg):
+        stamp = time.monotonic_ns()
+        for line in msg.data.split('\n'):  # A batched message carries several lines
+            writer.write(line.encode('ascii', 'replace'), stamp)
+
+    rclpy.init()
+    node = rclpy.create_node('raw_tof_recorder')
+    policies = {'best_effort': ReliabilityPolicy.BEST_EFFORT, 'reliable': ReliabilityPolicy.RELIABLE}
+    qos = QoSProfile(history=HistoryPolicy.KEEP_LAST, depth=100, reliability=policies[reliability])
+    node.create_subscription(String, topic, callback, qos)  # Best effort matches reliable and best effort publishers
+    node.create_timer(Flush_interval, writer.flush)
+    try:
+        rclpy.spin(node)
+    finally:
+        node.destroy_node()
+        rclpy.try_shutdown()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log', help='log file, appended to if it exists')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--port', help='record the raw bytes of this serial port')
+    source.add_argument('--topic', help='record the lines published on this topic')
+    parser.add_argument('--baudrate', type=int, default=2000000)
+    parser.add_argument('--qos-reliability', choices=('best_effort', 'reliable'), default='best_effort',
+                        help='reliability of the topic subscription')
+    args = parser.parse_args(args)
+
+    kind = KIND_BYTES if args.port else KIND_LINES
+    try:
+        with LogWriter(args.log, kind) as writer:
+            try:
+                if args.port:
+                    record_serial(writer, args.port, args.baudrate)
+                else:
+                    record_topic(writer, args.topic, args.qos_reliability)
+            except KeyboardInterrupt:
+                pass
+            print(f"Recorded {writer.records} records into {args.log}", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        sys.exit(f"record: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Region of interest cropping and voxel downsampling of ToF clouds.
+
+RegionFilter selects the points of a cloud that downstream consumers need
+before it is serialized, so fewer bytes are published and processed:
+
+    x, y, z       [min, max] limits of each coordinate, empty for no limit
+    sensor_masks  one bitmask per sensor, bit row * 8 + col keeps that pixel
+    voxel_size    edge in metres of the grid the kept points are averaged in,
+                  0 to keep every point
+
+Points without a distance (NaN x) are always dropped. The crop is a single
+boolean mask over the cloud and the downsampling hashes every point to its
+voxel and averages the points of a voxel with bincount, both without a
+Python loop over the points.
+"""
+import numpy
+
+from .geometry import PIXELS_PER_SENSOR
+
+
+def _limits(name, limits):
+    if not limits:
+        return None
+    if len(limits) != 2 or limits[0] > limits[1]:
+        raise ValueError("Region {} needs [min, max], got {}".format(name, list(limits)))
+    return float(limits[0]), float(limits[1])
+
+
+class RegionFilter(object):
+    """Crop and downsample clouds of size points, the layout of a Frame."""
+
+    def __init__(self, size, x=None, y=None, z=None, sensor_masks=None, voxel_size=0.0):
+        self.limits = [_limits(name, limits) for name, limits in (('x', x), ('y', y), ('z', z))]
+        if voxel_size < 0:
+            raise ValueError("Voxel size must not be negative, got {}".format(voxel_size))
+        self.voxel_size = voxel_size
+        self.pixels = None  # Pixels kept by the sensor masks, None for all
+        if sensor_masks:
+            sensors = size // PIXELS_PER_SENSOR
+            if len(sensor_masks) != sensors:
+                raise ValueError("Region sensor_masks needs one mask per sensor ({}), got {}".format(
+                    sensors, len(sensor_masks)))
+            bits = numpy.arange(PIXELS_PER_SENSOR)
+            masks = numpy.asarray(sensor_masks, dtype=numpy.int64).reshape(-1, 1)
+            self.pixels = ((masks >> bits) & 1).astype(bool).ravel()
+        self.size = size
+        self.points_in = 0
+        self.points_out = 0
+
+    @property
+    def enabled(self):
+        """False if the filter only drops the points without a distance."""
+        return any(self.limits) or self.pixels is not None or self.voxel_size > 0
+
+    def apply(self, points):
+        """Return the (M, 3) float32 points of the region, a new array."""
+        keep = ~numpy.isnan(points[:, 0])
+        if self.pixels is not None:
+            keep &= self.pixels
+        for axis, limits in enumerate(self.limits):
+            if limits is not None:
+                keep &= (points[:, axis] >= limits[0]) & (points[:, axis] <= limits[1])
+        kept = points[keep]
+        if self.voxel_size > 0 and len(kept):
+            kept = self.downsample(kept)
+        self.points_in += len(points)
+        self.points_out += len(kept)
+        return kept
+
+    def downsample(self, points):
+        """Return the centroid of the points of every occupied voxel."""
+        cells = numpy.floor(points / self.voxel_size).astype(numpy.int64)
+        cells -= cells.min(axis=0)
+        extent = cells.max(axis=0) + 1
+        keys = (cells[:, 0] * extent[1] + cells[:, 1]) * extent[2] + cells[:, 2]  # One integer per voxel
+        _, voxel = numpy.unique(keys, return_inverse=True)
+        voxel = voxel.ravel()
+        counts = numpy.bincount(voxel)
+        centroids = numpy.empty((len(counts), 3), dtype=numpy.float32)
+        for axis in range(3):
+            centroids[:, axis] = numpy.bincount(voxel, weights=points[:, axis]) / counts
+        return centroids
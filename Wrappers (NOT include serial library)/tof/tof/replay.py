@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Replay a raw ToF log recorded with the record tool.
+
+The records are replayed at the recorded pace, --speed times faster, or as
+fast as possible with --speed 0, either into a pseudo-terminal that the
+pointcloud node reads like the serial port, or directly into the Decoder,
+which prints what it decoded. Byte logs of a binary packet stream are
+decoded with --protocol binary or auto.
+
+    $ tof-replay capture.toflog --pty --wait
+    $ ros2 run pointcloud pointcloud --ros-args -p source:=serial -p port:=/dev/pts/5
+    $ tof-replay capture.toflog --speed 0
+"""
+import argparse
+import array
+import fcntl
+import os
+import pty
+import sys
+import termios
+import time
+import tty
+
+from tof.decoder import Decoder, First_CANID, Frame_timeout, Last_CANID, PROTOCOLS
+from tof.line_splitter import LineSplitter
+from tof.recording import KIND_BYTES, LogReader
+
+
+def paced(records, speed):
+    """Yield the (stamp, payload) records at speed times the recorded pace, at once if speed is 0."""
+    origin = None
+    previous = None
+    for stamp, payload in records:
+        if speed > 0:
+            if origin is None or stamp < previous:  # Start, or a recording appended after a reboot
+                origin = (stamp, time.monotonic())
+            due = origin[1] + (stamp - origin[0]) / 1e9 / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            previous = stamp
+        yield stamp, payload
+
+
+def lines_of(reader, records):
+    """Yield (stamp, line) for the records of a log of either kind."""
+    if reader.kind != KIND_BYTES:
+        return records
+    splitter = LineSplitter()
+    return ((stamp, line) for stamp, payload in records for line in splitter.split(payload))
+
+
+def unread(fd):
+    count = array.array('i', [0])
+    fcntl.ioctl(fd, termios.FIONREAD, count)
+    return count[0]
+
+
+def replay_pty(reader, records, wait):
+    master, slave = pty.openpty()  # Keep the slave open so the master survives reconnects
+    tty.setraw(slave)  # No CR to NL translation or echo before the reader configures the port
+    print(f"Replaying {reader.path} on {os.ttyname(slave)}", file=sys.stderr)
+    if wait:
+        input("Press Enter to start")
+    newline = b'' if reader.kind == KIND_BYTES else b'\n'
+    try:
+        for _, payload in records:
+            os.write(master, payload + newline)
+        while unread(slave):  # Closing the master would drop what the reader has not read yet
+            time.sleep(0.05)
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def replay_parser(reader, records, first_canid, last_canid, timeout, protocol='ascii'):
+    decoder = Decoder(first_canid, last_canid, timeout, protocol=protocol)
+    start = time.perf_counter()
+    if reader.kind == KIND_BYTES and protocol != 'ascii':
+        for stamp, payload in records:
+            stamp /= 1e9
+            for _ in decoder.feed_bytes(payload, stamp):
+                pass
+            decoder.poll(stamp)
+    else:
+        for stamp, line in lines_of(reader, records):
+            stamp /= 1e9  # Frames time out on the recorded clock
+            if decoder.feed_line(line, stamp) is None:
+                decoder.poll(stamp)
+    decoder.flush()
+    elapsed = time.perf_counter() - start
+    parser, assembler = decoder.parser, decoder.assembler
+    if decoder.protocol == 'binary':
+        packets = decoder.packets
+        print(f"{packets.packets} packets ({packets.crc_errors} CRC errors, {packets.discarded} bytes discarded), "
+              f"{assembler.frames} frames ({assembler.torn} torn, {assembler.timeouts} timed out) "
+              f"in {elapsed:.2f} s, {packets.packets / elapsed:,.0f} packets/s")
+    else:
+        print(f"{parser.lines} lines, {assembler.frames} frames ({assembler.torn} torn, "
+              f"{assembler.timeouts} timed out) in {elapsed:.2f} s, {parser.lines / elapsed:,.0f} lines/s")
+    rejects = ', '.join(f"{count} {reason}" for reason, count in parser.rejects.items() if count)
+    if rejects:
+        print(f"Rejected: {rejects}")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed factor, 0 for as fast as possible')
+    parser.add_argument('--pty', action='store_true', help='write to a pseudo-terminal instead of parsing')
+    parser.add_argument('--wait', action='store_true', help='wait for Enter once the pseudo-terminal exists')
+    parser.add_argument('--first-canid', type=int, default=First_CANID)
+    parser.add_argument('--last-canid', type=int, default=Last_CANID)
+    parser.add_argument('--frame-timeout', type=float, default=Frame_timeout)
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='ascii', help='format of a byte log')
+    args = parser.parse_args(args)
+
+    try:
+        reader = LogReader(args.log)
+        records = paced(reader, args.speed)
+        if args.pty:
+            replay_pty(reader, records, args.wait)
+        else:
+            replay_parser(reader, records, args.first_canid, args.last_canid, args.frame_timeout, args.protocol)
+    except (OSError, ValueError) as e:
+        sys.exit(f"replay: {e}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Direct access to the serial device of the sensor chain.
+
+The port is opened raw (8N1, no echo, no line processing) and non-blocking
+with termios only, so the pointcloud node can read the chain itself
+without the raw_tof node and without extra Python dependencies. Devices
+that are not terminals, such as a FIFO, are read as they are, and a
+pseudo-terminal can stand in for the USB-UART adapter.
+"""
+import os
+import select
+import termios
+import threading
+import time
+
+from .line_splitter import LineSplitter
+
+
+def open_serial(port, baudrate):
+    """Open the port in raw non-blocking mode and return its file descriptor."""
+    speed = getattr(termios, 'B{}'.format(baudrate), None)
+    if speed is None:
+        raise ValueError("Unsupported baud rate: {}".format(baudrate))
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        attrs = termios.tcgetattr(fd)
+    except termios.error:
+        return fd  # Not a terminal, nothing to configure
+    try:
+        attrs[0] = 0  # iflag: no input processing
+        attrs[1] = 0  # oflag: no output processing
+        attrs[2] = termios.CS8 | termios.CREAD | termios.CLOCAL  # cflag: 8N1, ignore modem lines
+        attrs[3] = 0  # lflag: no echo, no canonical mode
+        attrs[4] = speed  # ispeed
+        attrs[5] = speed  # ospeed
+        attrs[6][termios.VMIN] = 0
+        attrs[6][termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        termios.tcflush(fd, termios.TCIFLUSH)  # Drop stale data from before the port was opened
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+class SerialReader(threading.Thread):
+    """Read a serial device in a dedicated thread and hand over complete lines.
+
+    The thread blocks in select() until data arrives, reads everything that
+    is buffered in chunks of up to read_size bytes and calls
+    callback(lines, stamp) once with the complete lines of all chunks as
+    bytes, without their newline, and the monotonic time of the first read.
+    A callback that falls behind thus gets the whole backlog in one call and
+    can skip to its newest frame. Overlong and garbled lines are dropped by
+    self.splitter, which also counts the bytes and lines. With raw the
+    callback gets the bytes instead, e.g. for binary packets. The thread ends
+    when stop() is called or the device reports end of file or an error,
+    which is kept in self.error.
+    """
+
+    def __init__(self, port, baudrate, callback, read_size=65536, max_line_length=256, raw=False):
+        super().__init__(name='serial_reader', daemon=True)
+        self.port = port
+        self.callback = callback
+        self.read_size = read_size
+        self.error = None
+        self.splitter = None if raw else LineSplitter(max_line_length)
+        self.fd = open_serial(port, baudrate)
+        self._wakeup_r, self._wakeup_w = os.pipe()  # Interrupts select() on stop()
+
+    def run(self):
+        try:
+            while True:
+                readable, _, _ = select.select([self.fd, self._wakeup_r], [], [])
+                if self._wakeup_r in readable:
+                    return
+                try:
+                    data = os.read(self.fd, self.read_size)
+                except BlockingIOError:
+                    continue
+                stamp = time.monotonic()
+                if not data:
+                    self.error = "end of file"
+                    return
+                chunks = [data]
+                while len(data) == self.read_size:  # More is buffered, hand over the whole backlog at once
+                    try:
+                        data = os.read(self.fd, self.read_size)
+                    except BlockingIOError:
+                        break
+                    chunks.append(data)
+                data = b''.join(chunks)
+                if self.splitter is None:
+                    self.callback(data, stamp)
+                    continue
+                lines = self.splitter.split(data)  # Keeps the incomplete line for the next read
+                if lines:
+                    self.callback(lines, stamp)
+        except OSError as e:
+            self.error = str(e)  # E.g. the adapter was unplugged
+
+    def stop(self):
+        """Stop the thread and close the device."""
+        if self.fd is None:
+            return
+        if self.is_alive():
+            os.write(self._wakeup_w, b'\0')
+            self.join()
+        for fd in (self.fd, self._wakeup_r, self._wakeup_w):
+            os.close(fd)
+        self.fd = None
@@ -1,78 +1,207 @@
 #!/usr/bin/env python2.7
 #Subscribe raw Tof data and package it into pointcloud2 format and publish to ROS
+import sys
+import threading
 import rospy
-import re
-from sensor_msgs.msg import PointCloud2, PointField
-import sensor_msgs.point_cloud2 as pc2
-from std_msgs.msg import Header, String
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from sensor_msgs.msg import Image, PointCloud2, PointField
+from std_msgs.msg import Float64MultiArray, MultiArrayDimension, String, UInt8MultiArray
+
+try:
+    from time import monotonic
+except ImportError: # Python 2
+    from time import time as monotonic
+from tof.cliff import CliffDetector, load_floor
+from tof.decoder import Decoder
+from tof.diagnostics import SensorDiagnostics
+from tof.filter import TemporalFilter
+from tof.frame import POINT_STEP
+from tof.image import DepthImage
+from tof.latency import STAGES, LatencyHistogram
+from tof.region import RegionFilter
 
-Number_sensors = 5 #Define the number of connected Tof sensors
 First_CANID = 16 #Define the CAN ID of first Tof sensor
 Last_CANID = 20 #Define the CAN ID of last Tof sensor
+Frame_timeout = 0.5 #Define the time in seconds after which an incomplete frame is published
+Filter_mode = 'none' #Define the temporal filter: 'none', 'median', 'ema' or 'outlier'
+Filter_window = 5 #Define the number of frames the median and outlier filters look back
+Stamp_source = 'first' #Define the header stamp: receive time of the 'first' or 'last' line of a frame, or 'publish' time
+
+FIELDS = [
+    PointField(name='x', offset=0, datatype=PointField.FLOAT32, count=1),
+    PointField(name='y', offset=4, datatype=PointField.FLOAT32, count=1),
+    PointField(name='z', offset=8, datatype=PointField.FLOAT32, count=1)
+] # Define the fields for the point cloud, matching the Frame layout
+LEVELS = [DiagnosticStatus.OK, DiagnosticStatus.WARN, DiagnosticStatus.ERROR] # By SensorStatus.level
 
 class SerialToPointCloud2:
     def __init__(self):
         rospy.init_node('TOF_to_pointcloud2', anonymous=True) #Initialize ROS node
-        self.subscriber_ = rospy.Subscriber('raw_tof', String, self.process_data_callback) # Subscribe to raw tof data
-        self.publisher_ = rospy.Publisher('tof_sensor', PointCloud2, queue_size=1) # Set up a publisher for the PointCloud2 data
-        self.points = [] # Initialize a list to store point cloud data
+        self.publisher_ = rospy.Publisher('tof_sensor', PointCloud2, queue_size=rospy.get_param('~queue_size', 1)) # Set up a publisher for the PointCloud2 data, a slow subscriber gets the newest cloud
+        self.decoder = Decoder(rospy.get_param('~first_canid', First_CANID),
+                               rospy.get_param('~last_canid', Last_CANID),
+                               rospy.get_param('~frame_timeout', Frame_timeout)) # Parse the raw tof lines and assemble them into frames, rejects are counted by the decoder
+        self.filter = TemporalFilter(rospy.get_param('~filter_mode', Filter_mode),
+                                     rospy.get_param('~filter_window', Filter_window),
+                                     rospy.get_param('~filter_alpha', 0.5), # Weight of the newest frame in the EMA
+                                     rospy.get_param('~filter_threshold', 0.1)) # Outlier distance from the median in metres
+        region = RegionFilter(len(self.decoder.table),
+                              rospy.get_param('~roi_x', []), # [min, max] distance in metres, empty for no limit
+                              rospy.get_param('~roi_y', []),
+                              rospy.get_param('~roi_z', []),
+                              rospy.get_param('~roi_sensor_masks', []), # Kept pixels per sensor, bit row*8+col
+                              rospy.get_param('~roi_voxel_size', 0.0))
+        self.region = region if region.enabled else None # None publishes every point
+        self.cliff = None # Compares every frame against the floor model of the chain
+        floor = rospy.get_param('~cliff_floor', '') # Floor model file written by tof-floor
+        if floor:
+            self.cliff = CliffDetector(load_floor(floor),
+                                       rospy.get_param('~cliff_margin', 0.05), # Distance beyond the floor that is a drop-off
+                                       rospy.get_param('~cliff_min_pixels', 3)) # Pixels of a sensor that make a cliff
+            if len(self.cliff) != len(self.decoder.table):
+                raise ValueError("%s is not a floor model of the configured chain" % floor)
+            self.cliff_publisher = rospy.Publisher('tof_cliff', UInt8MultiArray, queue_size=1)
+        self.image = None # Depth image buffer, allocated for the first subscriber
+        self.image_publisher = rospy.Publisher('tof_depth', Image, queue_size=1) # Only filled while subscribed
+        self.stamp_source = rospy.get_param('~stamp_source', Stamp_source)
+        if self.stamp_source not in ('first', 'last', 'publish'):
+            raise ValueError("stamp_source must be 'first', 'last' or 'publish', not '%s'" % self.stamp_source)
+        self.lock = threading.Lock() # The timeout timer runs in its own thread
+        self.latency = LatencyHistogram() # raw_tof arrival to publish latency of the clouds
+        self.latency_publisher = rospy.Publisher('tof_latency', Float64MultiArray, queue_size=10)
+        self.latency_timer = rospy.Timer(rospy.Duration(5.0), self.publish_latency) # Latency histogram of the last 5 s
+        self.timeout_timer = rospy.Timer(rospy.Duration(0.05), self.timeout_callback) # Publish incomplete frames after the timeout
+        self.diagnostics = SensorDiagnostics(self.decoder)
+        self.levels = {} # Last diagnostic level per CAN ID, to log only changes
+        self.diagnostics_publisher = rospy.Publisher('/diagnostics', DiagnosticArray, queue_size=1)
+        self.diagnostics_timer = rospy.Timer(rospy.Duration(1.0), self.publish_diagnostics) # Health of every sensor
+        self.reported = self.decoder.counters()
+        self.report_timer = rospy.Timer(rospy.Duration(5.0), self.report_counters) # Summarize rejected lines instead of logging each one
+        self.dropped = 0 # Frames not published because a newer one was already decoded
+        self.subscriber_ = rospy.Subscriber('raw_tof', String, self.process_data_callback,
+                                            queue_size=rospy.get_param('~raw_queue_size', 200)) # Subscribe to raw tof data, older messages are dropped when the node falls behind
 
     def process_data_callback(self, data):
-        self.process_data(data.data) # Process the received data
-        if len(self.points) >= Number_sensors*32: # Check if the list of points is full
-            self.publish_points() # Publish the point cloud
-            self.points = [] # Clear the list
+        stamp = monotonic() # The message arrival is the receive time of its lines
+        with self.lock:
+            latest = None
+            for frame in self.decoder.feed_lines(data.data.split('\n'), stamp): # A batched message carries several lines
+                self.diagnostics.add(frame) # Count the received pixels before the filter
+                if latest is not None: # A backlog arrived at once, publish only its newest frame
+                    self.dropped += 1
+                latest = frame # Stays valid until the decoder emits the next frame
+            if latest is not None:
+                self.publish_points(latest) # Publish the point cloud
 
-    def process_data(self, data):
-        parts = data.split(':')  # Split the data by colon
-        if len(parts) < 2: # Check if the data is complete
-            #rospy.logerr("Received malformed data: {}".format(data))  # Log an error message
-            return
+    def publish_diagnostics(self, event):
+        msg = DiagnosticArray()
+        msg.header.stamp = rospy.Time.now()
+        with self.lock:
+            statuses = self.diagnostics.report()
+        for status in statuses:
+            name = "tof_sensor: CAN ID %d" % status.canid
+            last_seen = 'never' if status.last_seen is None else "%.3f s ago" % (monotonic() - status.last_seen)
+            msg.status.append(DiagnosticStatus(
+                level=LEVELS[status.level], name=name, message=status.message, hardware_id='raw_tof',
+                values=[KeyValue(key='frame_rate_hz', value="%.1f" % status.rate),
+                        KeyValue(key='completeness', value="%.3f" % status.completeness),
+                        KeyValue(key='rejected_lines', value=str(status.rejected)),
+                        KeyValue(key='last_seen', value=last_seen)]))
+            if self.levels.get(status.canid, 0) != status.level: # Log level changes, not every report
+                if status.level:
+                    rospy.logwarn("%s: %s", name, status.message)
+                else:
+                    rospy.loginfo("%s: recovered", name)
+                self.levels[status.canid] = status.level
+        self.diagnostics_publisher.publish(msg)
 
-        device_id_str = re.sub(r'\D', '', parts[0]) # Extract the device ID
-        if not device_id_str.isdigit(): # Check if the device ID is valid
-            #rospy.logerr("Invalid device ID: {}".format(parts[0]))
-            return
-        device_id = int(device_id_str) # Convert device ID to integer
+    def publish_latency(self, event):
+        with self.lock:
+            if not self.latency.frames():
+                return
+            msg = Float64MultiArray()
+            bins = len(self.latency.edges_ms) + 1
+            msg.layout.dim = [
+                MultiArrayDimension(label='stages:' + ','.join(STAGES), size=len(STAGES), stride=len(STAGES)*bins),
+                MultiArrayDimension(label='upper_edges_ms:' + ','.join(map(str, self.latency.edges_ms)) + ',inf',
+                                    size=bins, stride=bins)]
+            msg.data = [float(count) for count in self.latency.counts.ravel()]
+            self.latency.reset()
+        self.latency_publisher.publish(msg)
 
-        data_parts = parts[1].split(' ') # Split the coordinates and distance data
-        if len(data_parts) < 2:
-            #rospy.logerr("Malformed coordinates and distance: {}".format(parts[1]))
-            return
+    def report_counters(self, event):
+        with self.lock:
+            counters = self.decoder.counters()
+            counters.update(outliers=self.filter.rejected, dropped_frames=self.dropped)
+        changes = [(name, count - self.reported.get(name, 0))
+                   for name, count in sorted(counters.items()) if count > self.reported.get(name, 0)]
+        if changes:
+            rospy.logwarn("Raw tof problems in the last 5 s: %s", ', '.join("%d %s" % (count, name) for name, count in changes))
+        self.reported = counters
 
-        coords = re.sub(r'\D', '', data_parts[0])  # Extract the coordinates
-        if len(coords) < 2:
-            #rospy.logerr("Coordinates are too short: {}".format(coords))
-            return
-        distance_str = re.sub(r'\D', '', data_parts[1]) # Extract the distance
+    def timeout_callback(self, event):
+        with self.lock:
+            frame = self.decoder.poll()
+            if frame is not None:
+                self.diagnostics.add(frame)
+                self.publish_points(frame)
 
-        if not distance_str.isdigit(): # Check if the distance is valid
-            #rospy.logerr("Invalid distance: {}".format(distance_str))
-            return
-        try:
-            y, z = 0.01*(int(coords[1]))+0.08*(device_id-((Last_CANID + First_CANID)/2)-0.5), 0.02*(5-(int(coords[0])))+0.08 #Convert to point cloud coordinates
-            x = 0.001*(int(distance_str))
+    def stamp(self, frame):
+        now = rospy.Time.now()
+        if self.stamp_source == 'publish':
+            return now
+        received = frame.first_stamp if self.stamp_source == 'first' else frame.last_stamp
+        return now - rospy.Duration.from_sec(monotonic() - received) # Monotonic age moved onto the ROS clock
 
-        except IndexError as e:
-            #rospy.logerr("Index error while procrssing data: {}".format(e)) # Log an index error
-            return
-        except ValueError as e:
-            #rospy.logerr("Value error while procrssing data: {}".format(e)) # Log a value error
-            return
+    def publish_cliff(self, frame):
+        msg = UInt8MultiArray()
+        table = self.decoder.table
+        msg.layout.dim = [MultiArrayDimension(label='canid:%d-%d' % (table.first_canid, table.last_canid),
+                                              size=table.number_sensors, stride=table.number_sensors)]
+        msg.data = self.cliff.detect(frame.points).tobytes() # 0 floor, 1 cliff, 2 blind per sensor
+        self.cliff_publisher.publish(msg)
 
-        self.points.append([x, y, z]) # Add the point to the list
+    def publish_image(self, frame, stamp):
+        if self.image is None:
+            self.image = DepthImage(len(frame))
+        pixels = self.image.fill(frame.points) # Distance in millimetres, 0 without a distance
+        image = Image()
+        image.header.stamp = stamp
+        image.header.frame_id = "tof_sensor"
+        image.height = self.image.height # Pixel rows, each sensor is a tile of 8 columns in CAN ID order
+        image.width = self.image.width
+        image.encoding = '16UC1'
+        image.is_bigendian = sys.byteorder != 'little'
+        image.step = 2*image.width
+        image.data = pixels.tobytes()
+        self.image_publisher.publish(image)
 
-    def publish_points(self):
-        header = Header() # Create a header
-        header.stamp = rospy.Time.now() # Set the timestamp
-        header.frame_id = "tof_sensor" # Set the message frame ID
-        fields = [
-            PointField(name='x', offset=0, datatype=PointField.FLOAT32, count=1), 
-            PointField(name='y', offset=4, datatype=PointField.FLOAT32, count=1),
-            PointField(name='z', offset=8, datatype=PointField.FLOAT32, count=1)
-        ] # Define the fields for the point cloud
-        cloud = pc2.create_cloud(header, fields, self.points) # Create the point cloud message
+    def publish_points(self, frame):
+        parsed = monotonic() # The frame was emitted by the decoder just before
+        if self.cliff is not None:
+            self.publish_cliff(frame) # First, on the unfiltered frame, for the lowest latency
+        self.filter.apply(frame) # Denoise x in place, a no-op with filter_mode 'none'
+        stamp = self.stamp(frame)
+        if self.image_publisher.get_num_connections() > 0:
+            self.publish_image(frame, stamp)
+        points = frame.points # float32 x, y, z rows, already in PointCloud2 layout
+        dense = frame.dense
+        if self.region is not None:
+            points = self.region.apply(points) # Crop and downsample before serializing
+            dense = True # Points without a distance are dropped
+        cloud = PointCloud2()
+        cloud.header.stamp = stamp # Set the timestamp
+        cloud.header.frame_id = "tof_sensor" # Set the message frame ID
+        cloud.height = 1
+        cloud.width = len(points)
+        cloud.fields = FIELDS
+        cloud.is_bigendian = sys.byteorder != 'little'
+        cloud.point_step = POINT_STEP
+        cloud.row_step = POINT_STEP*len(points)
+        cloud.is_dense = dense # Missing pixels and outliers have a NaN x
+        cloud.data = points.tobytes() # Take the payload from the buffer, no per-point packing
         self.publisher_.publish(cloud) # Publish to ROS
+        self.latency.record(frame.first_stamp, frame.last_stamp, parsed, monotonic()) # Callers hold self.lock
 
 if __name__ == '__main__':
     node = SerialToPointCloud2()
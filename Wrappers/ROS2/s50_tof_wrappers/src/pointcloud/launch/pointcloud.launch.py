@@ -1,14 +1,45 @@
 from launch import LaunchDescription
+from launch.actions import DeclareLaunchArgument
+from launch.conditions import IfCondition, UnlessCondition
+from launch.substitutions import LaunchConfiguration
 from launch_ros.actions import Node
+from launch_ros.parameter_descriptions import ParameterValue
 
 def generate_launch_description():
+    # fused:=true reads the serial port in the pointcloud process instead of
+    # running raw_tof and sending every line through the raw_tof topic
+    fused = LaunchConfiguration('fused')
+    fused_arg = DeclareLaunchArgument(
+        'fused', default_value='false',
+        description='Read the serial port directly in the pointcloud node')
+    port_arg = DeclareLaunchArgument(
+        'port', default_value='/dev/ttyUSB1', description='Serial port of the sensor chain')
+    baudrate_arg = DeclareLaunchArgument(
+        'baudrate', default_value='2000000', description='Baud rate of the serial port')
     robot_01 = Node(
         package="raw_tof",
-        executable="raw_tof"
+        executable="raw_tof",
+        parameters=[{
+            'batch': True,  # Publish all lines of a serial read in one message
+            'port': LaunchConfiguration('port'),
+            'baudrate': ParameterValue(LaunchConfiguration('baudrate'), value_type=int)
+        }],
+        condition=UnlessCondition(fused)
     )
     control_01 = Node(
         package="pointcloud",
-        executable="pointcloud"
+        executable="pointcloud",
+        condition=UnlessCondition(fused)
+    )
+    fused_01 = Node(
+        package="pointcloud",
+        executable="pointcloud",
+        parameters=[{
+            'source': 'serial',  # raw_tof is still published while someone subscribes
+            'port': LaunchConfiguration('port'),
+            'baudrate': ParameterValue(LaunchConfiguration('baudrate'), value_type=int)
+        }],
+        condition=IfCondition(fused)
     )
     coor = Node(
         package='tf2_ros',
@@ -18,5 +49,5 @@ def generate_launch_description():
         arguments=['0', '0', '0', '0', '0', '0', 'tof_sensor', 'map']
         )
     launch_description = LaunchDescription(
-        [robot_01, control_01, coor])
+        [fused_arg, port_arg, baudrate_arg, robot_01, control_01, fused_01, coor])
     return launch_description
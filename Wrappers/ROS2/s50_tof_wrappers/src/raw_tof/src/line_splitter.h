@@ -0,0 +1,96 @@
+#ifndef RAW_TOF_LINE_SPLITTER_H
+#define RAW_TOF_LINE_SPLITTER_H
+
+#include <algorithm>
+#include <cstdint>
+#include <string>
+#include <vector>
+
+// Splits the serial byte stream into lines without erasing from a growing
+// string. Bytes are copied once into a fixed-capacity ring and lines are
+// found by advancing offsets. A line longer than max_line_length, or one
+// containing bytes that are neither printable ASCII nor '\r' / '\t', is
+// discarded up to the next newline, so a lost newline or a baud mismatch
+// never lets the buffer grow and the stream resynchronizes on its own.
+class LineSplitter {
+public:
+    LineSplitter(size_t capacity, size_t max_line_length)
+        : max_line_(std::max(max_line_length, size_t(1))),
+          ring_(std::max(capacity, max_line_ + 1)) {}  // A full line always fits
+
+    // Copy as much of data as fits into the ring, return the bytes taken
+    size_t write(const char *data, size_t size) {
+        size_t count = std::min(size, ring_.size() - static_cast<size_t>(tail_ - head_));
+        for (size_t done = 0; done < count;) {
+            size_t at = static_cast<size_t>((tail_ + done) % ring_.size());
+            size_t span = std::min(count - done, ring_.size() - at);  // Up to the end of the ring
+            std::copy(data + done, data + done + span, ring_.begin() + at);
+            done += span;
+        }
+        tail_ += count;
+        bytes_ += count;
+        return count;
+    }
+
+    // Move the next complete line, without its newline, into line
+    bool next(std::string &line) {
+        while (scan_ < tail_) {
+            unsigned char c = ring_[scan_ % ring_.size()];
+            scan_++;
+            if (skipping_) {  // Resynchronizing: drop everything up to the next newline
+                discarded_++;
+                head_ = scan_;
+                skipping_ = c != '\n';
+                continue;
+            }
+            if (c == '\n') {
+                if (bad_) {
+                    discarded_ += scan_ - head_;
+                    head_ = scan_;
+                    bad_ = false;
+                    continue;
+                }
+                copy(head_, scan_ - 1, line);
+                head_ = scan_;
+                lines_++;
+                return true;
+            }
+            if ((c < 0x20 || c > 0x7e) && c != '\r' && c != '\t') {
+                bad_ = true;  // Garbage, drop the line once it ends
+            }
+            if (scan_ - head_ > max_line_) {  // No newline in sight, drop what we have
+                discarded_ += scan_ - head_;
+                head_ = scan_;
+                bad_ = false;
+                skipping_ = true;
+            }
+        }
+        return false;
+    }
+
+    uint64_t bytes() const { return bytes_; }  // Bytes written
+    uint64_t lines() const { return lines_; }  // Lines returned by next()
+    uint64_t discarded() const { return discarded_; }  // Bytes of dropped lines, newlines included
+
+private:
+    void copy(uint64_t begin, uint64_t end, std::string &line) const {
+        size_t at = static_cast<size_t>(begin % ring_.size());
+        size_t length = static_cast<size_t>(end - begin);
+        size_t span = std::min(length, ring_.size() - at);  // The line may wrap around the ring
+        line.assign(ring_.begin() + at, ring_.begin() + at + span);
+        line.append(ring_.begin(), ring_.begin() + (length - span));
+    }
+
+    size_t max_line_;  // Longest line kept, in bytes
+    std::vector<char> ring_;  // Fixed-capacity storage
+    uint64_t head_ = 0;  // Start of the current line, stream offset
+    uint64_t scan_ = 0;  // First byte not yet scanned for a newline
+    uint64_t tail_ = 0;  // End of the written data
+    bool bad_ = false;  // The current line contains garbage
+    bool skipping_ = false;  // Dropping bytes up to the next newline
+    uint64_t bytes_ = 0;
+    uint64_t lines_ = 0;
+    uint64_t discarded_ = 0;
+};
+
+#endif  // RAW_TOF_LINE_SPLITTER_H
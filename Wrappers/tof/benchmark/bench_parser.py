@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the raw ToF line parser.
+
+Compares the lines per second of LineParser against the split/re.sub
+parser the pointcloud node used before. Run from the tof directory:
+
+    $ python3 benchmark/bench_parser.py --sensors 5 --frames 2000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tof.geometry import PIXEL_COLS, PIXEL_ROWS  # noqa: E402
+from tof.line_parser import LineParser  # noqa: E402
+
+
+def legacy_parse(data):
+    parts = data.split(':')
+    if len(parts) < 2:
+        return None
+    device_id_str = re.sub(r'\D', '', parts[0])
+    if not device_id_str.isdigit():
+        return None
+    device_id = int(device_id_str)
+    data_parts = parts[1].split(' ')
+    if len(data_parts) < 2:
+        return None
+    coords = re.sub(r'\D', '', data_parts[0])
+    if len(coords) < 2:
+        return None
+    distance_str = re.sub(r'\D', '', data_parts[1])
+    if not distance_str.isdigit():
+        return None
+    return device_id, int(coords[0]), int(coords[1]), int(distance_str)
+
+
+def make_lines(sensors, frames, first_canid=16, noise=0.0, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(frames):
+        for device_id in range(first_canid, first_canid + sensors):
+            for row in range(PIXEL_ROWS):
+                for col in range(PIXEL_COLS):
+                    if noise and rng.random() < noise:
+                        lines.append(f"{device_id}:{row}")  # Truncated line
+                    else:
+                        lines.append(f"{device_id}:{row}{col} {rng.randint(30, 4000)}")
+    return lines
+
+
+def lines_per_second(parse, lines, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=5)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--noise', type=float, default=0.0, help='fraction of truncated lines')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    lines = make_lines(args.sensors, args.frames, noise=args.noise)
+    line_parser = LineParser()
+    assert all(legacy_parse(line) == line_parser.parse(line) for line in lines[:10000])
+
+    legacy = lines_per_second(legacy_parse, lines, args.repeat)
+    fast = lines_per_second(LineParser().parse, lines, args.repeat)
+    print(f"{len(lines)} lines, {args.sensors} sensors, noise {args.noise:.2%}")
+    print(f"legacy split/re.sub: {legacy:12,.0f} lines/s")
+    print(f"LineParser:          {fast:12,.0f} lines/s  ({fast / legacy:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
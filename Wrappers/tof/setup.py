@@ -0,0 +1,16 @@
+from setuptools import setup
+
+setup(
+    name='tof',
+    version='0.0.0',
+    packages=['tof'],
+    install_requires=['numpy'],
+    description='ROS independent decoder of the raw AFBR-S50 ToF stream',
+    entry_points={
+        'console_scripts': [
+            "tof-floor = tof.floor:main",
+            "tof-record = tof.record:main",
+            "tof-replay = tof.replay:main"
+        ],
+    },
+)
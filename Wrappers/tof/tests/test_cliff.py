@@ -0,0 +1,100 @@
+import numpy
+import pytest
+
+from tof.cliff import BLIND, CLEAR, CLIFF, CliffDetector, calibrate, load_floor, save_floor
+from tof.geometry import PIXELS_PER_SENSOR
+
+SENSORS = 3
+FLOOR = 0.5
+
+
+def make_floor():
+    """Floor model of three sensors, the first row of sensor 1 looks ahead and sensor 2 sees no floor."""
+    floor = numpy.full(SENSORS * PIXELS_PER_SENSOR, FLOOR, dtype=numpy.float32)
+    floor[PIXELS_PER_SENSOR:PIXELS_PER_SENSOR + 8] = numpy.nan
+    floor[2 * PIXELS_PER_SENSOR:] = numpy.nan
+    return floor
+
+
+def floor_points(floor):
+    """Points of a frame that sees flat floor, the pixels without floor measure far away."""
+    points = numpy.zeros((len(floor), 3), dtype=numpy.float32)
+    points[:, 0] = numpy.where(numpy.isnan(floor), 5.0, floor)
+    return points
+
+
+def pixels(sensor, count, start=8):
+    """Flat indices of count pixels of a sensor from pixel start on."""
+    return sensor * PIXELS_PER_SENSOR + numpy.arange(start, start + count)
+
+
+def test_clear_cliff_and_min_pixels():
+    floor = make_floor()
+    detector = CliffDetector(floor, margin=0.05, min_pixels=3)
+    points = floor_points(floor)
+    assert detector.detect(points).tolist() == [CLEAR, CLEAR, CLEAR]
+    points[pixels(0, 2), 0] = FLOOR + 0.2  # Two pixels beyond the floor are below min_pixels
+    assert detector.detect(points).tolist() == [CLEAR, CLEAR, CLEAR]
+    points[pixels(0, 3), 0] = FLOOR + 0.2
+    points[pixels(1, 3), 0] = numpy.nan  # Missing pixels are not drop-offs
+    assert detector.detect(points).tolist() == [CLIFF, CLEAR, CLEAR]
+    assert detector.drops.tolist() == [3, 0, 0]
+    assert detector.cliffs == 1
+
+
+def test_blind_sensor():
+    floor = make_floor()
+    detector = CliffDetector(floor, min_pixels=3)
+    points = floor_points(floor)
+    points[pixels(1, PIXELS_PER_SENSOR - 8 - 2), 0] = numpy.nan  # Two floor pixels of sensor 1 return
+    points[2 * PIXELS_PER_SENSOR:, 0] = numpy.nan  # Sensor 2 has no floor pixels and is never blind
+    assert detector.detect(points).tolist() == [CLEAR, BLIND, CLEAR]
+    points[pixels(1, 1, start=PIXELS_PER_SENSOR - 3), 0] = FLOOR
+    assert detector.detect(points).tolist() == [CLEAR, CLEAR, CLEAR]
+
+
+def test_margin_and_pixels_without_floor():
+    floor = make_floor()
+    detector = CliffDetector(floor, margin=0.05, min_pixels=1)
+    points = floor_points(floor)
+    points[pixels(1, 8, start=0), 0] = 10.0  # Far beyond, but these pixels have no floor distance
+    points[2 * PIXELS_PER_SENSOR:, 0] = 10.0
+    points[pixels(0, 1), 0] = FLOOR + 0.04  # Within the margin
+    assert detector.detect(points).tolist() == [CLEAR, CLEAR, CLEAR]
+    points[pixels(0, 1), 0] = FLOOR + 0.06
+    assert detector.detect(points).tolist() == [CLIFF, CLEAR, CLEAR]
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        CliffDetector(make_floor(), margin=0)
+    with pytest.raises(ValueError):
+        CliffDetector(make_floor(), min_pixels=0)
+    with pytest.raises(ValueError):
+        CliffDetector(make_floor(), min_pixels=PIXELS_PER_SENSOR + 1)
+
+
+def test_calibrate_min_valid():
+    distances = numpy.full((4, PIXELS_PER_SENSOR), FLOOR, dtype=numpy.float32)
+    distances[0, 0] = 0.4
+    distances[1:, 1] = numpy.nan  # Pixel 1 returned in 1 of 4 frames
+    distances[2:, 2] = numpy.nan  # Pixel 2 returned in 2 of 4 frames
+    distances[:, 3] = numpy.nan  # Pixel 3 never returned
+    floor = calibrate(distances, min_valid=0.5)
+    assert floor.dtype == numpy.float32
+    assert floor[0] == FLOOR  # The median ignores the outlier
+    assert numpy.isnan(floor[[1, 3]]).all()
+    assert floor[2] == FLOOR
+    assert numpy.isnan(calibrate(distances, min_valid=0.75)[2])
+
+
+def test_load_floor(tmp_path):
+    path = str(tmp_path / 'floor.npy')
+    save_floor(path, make_floor())
+    numpy.testing.assert_array_equal(load_floor(path), make_floor())
+    save_floor(path, numpy.full(PIXELS_PER_SENSOR + 1, FLOOR))
+    with pytest.raises(ValueError):
+        load_floor(path)
+    save_floor(path, numpy.full((2, PIXELS_PER_SENSOR), FLOOR))
+    with pytest.raises(ValueError):
+        load_floor(path)
@@ -0,0 +1,37 @@
+import warnings
+
+import numpy
+
+from tof.filter import TemporalFilter
+from tof.frame import Frame
+from tof.geometry import CoordinateTable
+
+
+def test_median_matches_nanmedian():
+    rng = numpy.random.RandomState(0)
+    frame = Frame(CoordinateTable(16, 18))
+    temporal_filter = TemporalFilter(mode='median', window=5)
+    history = []
+    for _ in range(12):
+        x = rng.uniform(0.1, 3.0, len(frame)).astype(numpy.float32)
+        x[rng.random_sample(len(frame)) < 0.3] = numpy.nan
+        history.append(x.copy())
+        frame.points[:, 0] = x
+        temporal_filter.apply(frame)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN pixels
+            expected = numpy.nanmedian(numpy.stack(history[-5:]), axis=0)
+        expected[numpy.isnan(x)] = numpy.nan  # Missing pixels stay missing
+        numpy.testing.assert_allclose(frame.points[:, 0], expected, rtol=1e-6)
+
+
+def test_outlier_rejects_jumps():
+    frame = Frame(CoordinateTable(16, 16))
+    temporal_filter = TemporalFilter(mode='outlier', window=5)
+    for _ in range(5):
+        frame.points[:, 0] = 1.0
+        temporal_filter.apply(frame)
+    frame.points[:, 0] = 1.0
+    frame.points[3, 0] = 2.5
+    assert temporal_filter.apply(frame) == 1
+    assert numpy.isnan(frame.points[3, 0])
@@ -0,0 +1,51 @@
+import numpy
+
+from tof.frame import Frame
+from tof.geometry import CoordinateTable, DISTANCE_SCALE, PIXEL_COLS, PIXEL_ROWS
+from tof.image import DepthImage
+
+
+def make_frame(first_canid=16, last_canid=18):
+    """A frame whose distance in mm encodes the sensor, row and column of every pixel."""
+    table = CoordinateTable(first_canid, last_canid)
+    frame = Frame(table)
+    for sensor in range(table.number_sensors):
+        for row in range(PIXEL_ROWS):
+            for col in range(PIXEL_COLS):
+                index = table.index(first_canid + sensor, row, col)
+                frame.points[index, 0] = DISTANCE_SCALE * (1000 * (sensor + 1) + 10 * row + col)
+    return frame
+
+
+def test_tiles_side_by_side_in_can_id_order():
+    frame = make_frame()
+    image = DepthImage(len(frame))
+    pixels = image.fill(frame.points)
+    assert pixels.dtype == numpy.uint16
+    assert (image.height, image.width) == (PIXEL_ROWS, 3 * PIXEL_COLS)
+    for sensor in range(3):
+        for row in range(PIXEL_ROWS):
+            for col in range(PIXEL_COLS):
+                assert pixels[row, sensor * PIXEL_COLS + col] == 1000 * (sensor + 1) + 10 * row + col
+
+
+def test_missing_pixels_are_zero():
+    frame = make_frame(16, 17)
+    frame.points[[0, 33], 0] = numpy.nan  # Sensor 0 row 0 col 0, sensor 1 row 0 col 1
+    pixels = DepthImage(len(frame)).fill(frame.points)
+    assert pixels[0, 0] == 0
+    assert pixels[0, PIXEL_COLS + 1] == 0
+    assert pixels[0, 1] == 1001
+
+
+def test_distances_are_rounded_and_clipped():
+    frame = make_frame(16, 16)
+    frame.points[0, 0] = 70.0  # 70000 mm is beyond the 16 bit range
+    frame.points[1, 0] = 65.535
+    frame.points[2, 0] = -0.1
+    frame.points[3, 0] = 0.0016  # 1.6 mm
+    image = DepthImage(len(frame))
+    pixels = image.fill(frame.points)
+    assert pixels[0, :4].tolist() == [65535, 65535, 0, 2]
+    frame.points[0, 0] = numpy.nan  # The buffer is refilled, not accumulated
+    assert image.fill(frame.points)[0, 0] == 0
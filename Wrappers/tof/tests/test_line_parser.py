@@ -0,0 +1,40 @@
+from tof.decoder import Decoder
+from tof.line_parser import (BAD_DISTANCE, BAD_ID, LineParser, MALFORMED, OTHER_IDS, SHORT_COORDS,
+                             UNKNOWN_PIXEL)
+
+
+def test_parse_text_and_bytes():
+    parser = LineParser()
+    assert parser.parse('16:03 1234') == (16, 0, 3, 1234)
+    assert parser.parse(b'17:31 42\r') == (17, 3, 1, 42)
+    assert parser.parse('x16:03 1234') == (16, 0, 3, 1234)  # Stray characters before the ID
+    assert parser.rejected() == 0
+
+
+def test_reject_reasons():
+    parser = LineParser()
+    for line in ('garbage', ':03 12', '16:3 12', '16:03 x', '16:03'):
+        assert parser.parse(line) is None
+    assert parser.rejects[MALFORMED] == 2
+    assert parser.rejects[BAD_ID] == 1
+    assert parser.rejects[SHORT_COORDS] == 1
+    assert parser.rejects[BAD_DISTANCE] == 1
+    assert parser.rejects_by_id == {16: 3}
+
+
+def test_rejects_by_id_are_bounded_to_the_chain():
+    decoder = Decoder(16, 20, timeout=0)
+    for device_id in range(100000):
+        decoder.feed_line('{}:99 100'.format(device_id))  # Unknown pixel of every CAN ID
+    rejects_by_id = decoder.parser.rejects_by_id
+    assert set(rejects_by_id) == {16, 17, 18, 19, 20, OTHER_IDS}
+    assert rejects_by_id[OTHER_IDS] == 100000 - 5
+    assert decoder.parser.rejects[UNKNOWN_PIXEL] == 100000
+
+
+def test_configure_moves_the_chain():
+    decoder = Decoder(16, 17, timeout=0)
+    decoder.configure(18, 19, 0)
+    decoder.feed_line('16:00 100')
+    decoder.feed_line('18:99 100')
+    assert decoder.parser.rejects_by_id == {OTHER_IDS: 1, 18: 1}
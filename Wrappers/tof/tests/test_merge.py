@@ -0,0 +1,58 @@
+import numpy
+
+from tof.frame import Frame
+from tof.geometry import CoordinateTable
+from tof.merge import FrameMerger
+
+TABLE = CoordinateTable(16, 16)
+SIZE = len(TABLE)
+
+
+def make_frame(chain, number, stamp):
+    """A complete frame whose distances encode the chain and the frame number."""
+    frame = Frame(TABLE)
+    frame.points[:, 0] = chain * 1000 + number
+    frame.filled[:] = b'\x01' * SIZE
+    frame.count = SIZE
+    frame.first_stamp = frame.last_stamp = stamp
+    return frame
+
+
+def chain_frames(merged, chain):
+    """Return the frame numbers in the rows of a chain of a merged frame."""
+    x = merged.points[chain * SIZE:(chain + 1) * SIZE, 0]
+    return set((x[~numpy.isnan(x)] - chain * 1000).astype(int).tolist())
+
+
+def test_unequal_chain_rates():
+    merger = FrameMerger([SIZE, SIZE], timeout=0.5)
+    events = [(number / 30.0, 0, number) for number in range(30)]  # 30 Hz chain
+    events += [(number / 10.0 + 0.01, 1, number) for number in range(10)]  # 10 Hz chain
+    merged_frames = []
+    for stamp, chain, number in sorted(events):
+        merged = merger.add(chain, make_frame(chain, number, stamp))
+        if merged is not None:
+            merged_frames.append(merged)
+    assert len(merged_frames) == 10
+    for number, merged in enumerate(merged_frames):
+        assert merged.chains == 2 and merged.complete
+        assert not numpy.isnan(merged.points).any()
+        assert chain_frames(merged, 1) == {number}
+        assert chain_frames(merged, 0) == {3 * number}  # The latest frame of the fast chain
+    assert merger.partial == 0
+    assert merger.replaced == 2 * 9 + 1  # Two fast frames per merge after the first, one more pending at the end
+
+
+def test_timeout_emits_without_a_stalled_chain():
+    merger = FrameMerger([SIZE, SIZE], timeout=0.5)
+    assert merger.add(0, make_frame(0, 0, 0.0)) is None
+    assert merger.add(0, make_frame(0, 1, 0.3)) is None
+    assert merger.poll(0.4) is None
+    merged = merger.poll(0.5)
+    assert merged.chains == 1 and not merged.complete
+    assert chain_frames(merged, 0) == {1}
+    assert numpy.isnan(merged.points[SIZE:, 0]).all()
+    assert merger.add(0, make_frame(0, 2, 0.6)) is None
+    merged = merger.add(0, make_frame(0, 3, 1.2))  # The add times the merge out as well
+    assert chain_frames(merged, 0) == {2}
+    assert merger.partial == 2
@@ -0,0 +1,78 @@
+import numpy
+import pytest
+
+from tof.geometry import PIXELS_PER_SENSOR
+from tof.region import RegionFilter
+
+SIZE = 2 * PIXELS_PER_SENSOR
+
+
+def cloud(x=1.0):
+    """Points of two sensors, x the same everywhere, y the pixel index and z its negative."""
+    points = numpy.empty((SIZE, 3), dtype=numpy.float32)
+    points[:, 0] = x
+    points[:, 1] = numpy.arange(SIZE)
+    points[:, 2] = -numpy.arange(SIZE)
+    return points
+
+
+def rows(points):
+    """The points as a sorted list of rounded tuples, the voxel order is not part of the result."""
+    return sorted(tuple(round(float(value), 5) for value in point) for point in points)
+
+
+def test_nan_points_are_always_dropped():
+    region = RegionFilter(SIZE)
+    points = cloud()
+    points[[3, 40], 0] = numpy.nan
+    assert not region.enabled
+    assert len(region.apply(points)) == SIZE - 2
+    assert (region.points_in, region.points_out) == (SIZE, SIZE - 2)
+
+
+def test_crop_limits_are_inclusive():
+    region = RegionFilter(SIZE, y=[10, 20], z=[-15, 0])
+    kept = region.apply(cloud())
+    assert kept[:, 1].tolist() == list(range(10, 16))
+    points = cloud()
+    points[:5, 0] = 0.5
+    assert len(RegionFilter(SIZE, x=[0.0, 0.5]).apply(points)) == 5
+    assert len(RegionFilter(SIZE, x=[1.5, 2.0]).apply(points)) == 0
+    with pytest.raises(ValueError):
+        RegionFilter(SIZE, x=[2.0, 1.0])
+    with pytest.raises(ValueError):
+        RegionFilter(SIZE, z=[1.0])
+
+
+def test_sensor_masks():
+    region = RegionFilter(SIZE, sensor_masks=[-1, 0b101])  # -1 keeps every pixel of sensor 0
+    kept = region.apply(cloud())
+    assert kept[:, 1].tolist() == list(range(PIXELS_PER_SENSOR)) + [PIXELS_PER_SENSOR, PIXELS_PER_SENSOR + 2]
+    assert len(RegionFilter(SIZE, sensor_masks=[-1, -1]).apply(cloud())) == SIZE
+    assert len(RegionFilter(SIZE, sensor_masks=[0, 0]).apply(cloud())) == 0
+    with pytest.raises(ValueError):
+        RegionFilter(SIZE, sensor_masks=[-1])
+
+
+def test_voxel_centroids():
+    region = RegionFilter(4, voxel_size=1.0)
+    points = numpy.array([[0.2, 0.2, 0.2],
+                          [0.8, 0.4, 0.6],
+                          [1.5, 0.5, 0.5],
+                          [numpy.nan, 0.5, 0.5]], dtype=numpy.float32)
+    assert rows(region.apply(points)) == [(0.5, 0.3, 0.4), (1.5, 0.5, 0.5)]
+    with pytest.raises(ValueError):
+        RegionFilter(4, voxel_size=-1.0)
+
+
+def test_voxels_straddling_the_origin():
+    region = RegionFilter(6, voxel_size=0.1)
+    points = numpy.array([[-0.01, -0.01, 0.0],
+                          [-0.09, -0.05, 0.0],
+                          [0.01, 0.01, 0.0],
+                          [0.05, 0.09, 0.0],
+                          [-0.01, 0.01, 0.0],
+                          [0.01, -0.01, 0.0]], dtype=numpy.float32)
+    kept = region.apply(points)
+    assert len(kept) == 4  # Points on either side of 0 fall in different voxels
+    assert rows(kept) == rows([[-0.05, -0.03, 0.0], [-0.01, 0.01, 0.0], [0.01, -0.01, 0.0], [0.03, 0.05, 0.0]])
@@ -0,0 +1,45 @@
+import os
+import pty
+import threading
+
+from tof import replay
+from tof.binary import encode
+from tof.recording import KIND_BYTES, LogReader, LogWriter
+
+
+def test_pty_replays_bytes_unchanged(tmp_path, monkeypatch):
+    data = encode([(16, 1, 5, 0x0D0A), (16, 1, 5, 0x0A0D)]) + b'16:00 13\r\n\r'  # CR bytes in packets and lines
+    path = str(tmp_path / 'capture.toflog')
+    with LogWriter(path, KIND_BYTES) as writer:
+        writer.write(data[:5], 1)
+        writer.write(data[5:], 2)
+    opened = []
+    started = threading.Event()
+    original = pty.openpty
+
+    def openpty():
+        opened.extend(original())
+        started.set()
+        return opened
+
+    monkeypatch.setattr(pty, 'openpty', openpty)
+    reader = LogReader(path)
+    read = threading.Event()
+
+    def records():
+        for record in reader:
+            yield record
+        read.wait(5)  # Keep the master open until the test has read everything
+
+    thread = threading.Thread(target=replay.replay_pty, args=(reader, records(), False))
+    thread.start()
+    try:
+        assert started.wait(5)
+        slave = opened[1]
+        received = b''
+        while len(received) < len(data):  # Read on the replay's own slave, before the port is configured
+            received += os.read(slave, 4096)
+    finally:
+        read.set()
+        thread.join(5)
+    assert received == data
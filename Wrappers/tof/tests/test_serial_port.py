@@ -0,0 +1,60 @@
+import os
+import pty
+import threading
+import time
+
+from tof.binary import encode
+from tof.serial_port import SerialReader
+
+
+def read_from_pty(data, **kwargs):
+    """Write data to a pseudo-terminal and return what a SerialReader on it handed over."""
+    master, slave = pty.openpty()
+    received = []
+    done = threading.Event()
+
+    def callback(payload, stamp):
+        received.append((payload, stamp))
+        if sum(len(p) if kwargs.get('raw') else len(b''.join(p)) + len(p) for p, _ in received) >= len(data):
+            done.set()
+
+    reader = SerialReader(os.ttyname(slave), 2000000, callback, read_size=256, **kwargs)
+    reader.start()
+    try:
+        for start in range(0, len(data), 1000):
+            os.write(master, data[start:start + 1000])
+        assert done.wait(5)
+    finally:
+        reader.stop()
+        os.close(master)
+        os.close(slave)
+    return reader, received
+
+
+def test_lines():
+    data = b''.join('16:{}{} {}\n'.format(i % 4, i % 8, i).encode('ascii') for i in range(2000))
+    reader, received = read_from_pty(data)
+    lines = [line for payload, _ in received for line in payload]
+    assert lines == data.split(b'\n')[:-1]
+    assert reader.splitter.lines == 2000 and reader.error is None
+    stamps = [stamp for _, stamp in received]
+    assert stamps == sorted(stamps) and stamps[-1] <= time.monotonic()
+
+
+def test_raw_bytes():
+    data = encode([(16, i % 4, i % 8, i) for i in range(2000)])
+    reader, received = read_from_pty(data, raw=True)
+    assert b''.join(payload for payload, _ in received) == data
+    assert reader.splitter is None
+
+
+def test_stop_while_idle():
+    master, slave = pty.openpty()
+    reader = SerialReader(os.ttyname(slave), 115200, lambda *args: None)
+    reader.start()
+    start = time.monotonic()
+    reader.stop()
+    assert not reader.is_alive() and time.monotonic() - start < 1
+    reader.stop()  # A second stop does nothing
+    os.close(master)
+    os.close(slave)
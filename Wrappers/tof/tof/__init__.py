@@ -0,0 +1,27 @@
+"""ROS independent decoding of the raw AFBR-S50 ToF stream.
+
+The ROS1 and ROS2 pointcloud nodes are thin adapters over this package, and
+offline tools can decode recorded streams with it without a ROS graph. The
+decoding modules run on Python 2.7 and 3; serial_port and the floor, record
+and replay tools need Python 3.
+"""
+from .binary import PacketDecoder, encode
+from .cliff import CliffDetector
+from .decoder import Decoder, decode_bytes, decode_lines, decode_log
+from .diagnostics import SensorDiagnostics, SensorStatus
+from .filter import TemporalFilter
+from .frame import Frame, FrameAssembler, POINT_STEP
+from .geometry import CoordinateTable
+from .image import DepthImage
+from .latency import LatencyHistogram
+from .line_parser import LineParser
+from .line_splitter import LineSplitter
+from .merge import FrameMerger, MergedFrame
+from .region import RegionFilter
+
+__all__ = [
+    'CliffDetector', 'CoordinateTable', 'Decoder', 'DepthImage', 'Frame', 'FrameAssembler', 'FrameMerger',
+    'LatencyHistogram', 'LineParser', 'LineSplitter', 'MergedFrame', 'POINT_STEP', 'PacketDecoder',
+    'RegionFilter', 'SensorDiagnostics', 'SensorStatus', 'TemporalFilter', 'decode_bytes', 'decode_lines',
+    'decode_log', 'encode',
+]
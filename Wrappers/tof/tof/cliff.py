@@ -0,0 +1,84 @@
+"""Cliff and drop-off detection on ToF frames.
+
+Sensors looking down in front of the robot measure a known distance to
+flat floor. The floor model holds that distance for every pixel of the
+chain, calibrated from frames recorded on flat floor (see the floor tool).
+A pixel sees a drop-off when it measures more than margin metres beyond
+its floor distance, and a sensor reports a cliff once min_pixels of its
+pixels do. Detecting is one comparison over the frame and a sum per
+sensor, so it runs on every frame as soon as it is assembled, before it is
+filtered or published.
+
+Pixels without a floor distance (NaN in the model, e.g. pixels looking
+ahead over the floor) are ignored. A sensor whose floor pixels returned
+fewer than min_pixels distances cannot tell floor from void and is BLIND.
+"""
+import numpy
+
+from .geometry import PIXELS_PER_SENSOR
+
+CLEAR, CLIFF, BLIND = 0, 1, 2  # State of a sensor
+
+
+def calibrate(distances, min_valid=0.5):
+    """Return the floor model, the per-pixel median of a (frames, pixels) array of x.
+
+    Pixels with a distance in less than min_valid of the frames get NaN.
+    """
+    distances = numpy.asarray(distances, dtype=numpy.float32)
+    valid = numpy.mean(~numpy.isnan(distances), axis=0)
+    floor = numpy.full(distances.shape[1], numpy.nan, dtype=numpy.float32)
+    seen = valid >= min_valid
+    floor[seen] = numpy.nanmedian(distances[:, seen], axis=0)
+    return floor
+
+
+def save_floor(path, floor):
+    with open(path, 'wb') as f:
+        numpy.save(f, numpy.asarray(floor, dtype=numpy.float32))
+
+
+def load_floor(path):
+    """Load a floor model saved by save_floor()."""
+    floor = numpy.load(path)
+    if floor.ndim != 1 or len(floor) % PIXELS_PER_SENSOR:
+        raise ValueError("{} is not a floor model of whole sensors".format(path))
+    return floor.astype(numpy.float32)
+
+
+class CliffDetector(object):
+    """Compare the frames of one chain against its floor model."""
+
+    def __init__(self, floor, margin=0.05, min_pixels=3):
+        floor = numpy.asarray(floor, dtype=numpy.float32).reshape(-1, PIXELS_PER_SENSOR)
+        if margin <= 0:
+            raise ValueError("Cliff margin must be positive, got {}".format(margin))
+        if not 1 <= min_pixels <= PIXELS_PER_SENSOR:
+            raise ValueError("Cliff min_pixels must be 1 to {}, got {}".format(PIXELS_PER_SENSOR, min_pixels))
+        self.floor = floor
+        self.limit = floor + numpy.float32(margin)  # NaN for pixels without floor, never exceeded
+        self.watched = ~numpy.isnan(floor)
+        self.blind_possible = self.watched.sum(axis=1) > 0  # Sensors with floor pixels
+        self.margin = margin
+        self.min_pixels = min_pixels
+        self.states = numpy.zeros(len(floor), dtype=numpy.uint8)
+        self.drops = numpy.zeros(len(floor), dtype=numpy.int64)  # Pixels beyond the floor per sensor
+        self.cliffs = 0  # Frames with at least one cliff
+
+    def __len__(self):
+        return len(self.floor) * PIXELS_PER_SENSOR
+
+    def detect(self, points):
+        """Return the state of every sensor for the (N, 3) points of a frame.
+
+        The returned array is overwritten by the next call.
+        """
+        x = points[:, 0].reshape(self.floor.shape)
+        numpy.sum(x > self.limit, axis=1, out=self.drops)  # Comparisons with NaN are False
+        returned = numpy.sum(self.watched & ~numpy.isnan(x), axis=1)
+        self.states[:] = CLEAR
+        self.states[self.blind_possible & (returned < self.min_pixels)] = BLIND
+        self.states[self.drops >= self.min_pixels] = CLIFF
+        if self.drops.max() >= self.min_pixels:
+            self.cliffs += 1
+        return self.states
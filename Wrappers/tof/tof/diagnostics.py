@@ -0,0 +1,99 @@
+"""Per-sensor health of one sensor chain.
+
+SensorDiagnostics watches the frames emitted by a Decoder and summarizes
+every sensor of the chain once per report:
+
+    rate          frames per second in which the sensor reported a pixel
+    completeness  share of the sensor's pixels present in the emitted frames
+    rejected      lines with the sensor's CAN ID rejected by the parser
+    last_seen     receive time of the last frame the sensor was part of
+
+Counting a frame is a single sum over its fill bitmap, so the diagnostics
+cost the same on a clean and on a noisy bus. The ROS nodes publish the
+reports as diagnostic_msgs and only log when the level of a sensor changes.
+"""
+import collections
+
+import numpy
+
+from .geometry import PIXELS_PER_SENSOR
+
+try:
+    from time import monotonic
+except ImportError:  # Python 2
+    from time import time as monotonic
+
+OK, WARN, ERROR = 0, 1, 2  # Levels of diagnostic_msgs/DiagnosticStatus
+
+SensorStatus = collections.namedtuple(
+    'SensorStatus', 'canid level message rate completeness rejected last_seen')
+
+
+class SensorDiagnostics(object):
+    """Collect per-sensor statistics of the frames of one decoder.
+
+    A sensor is an error if it was not part of a frame for stale_timeout
+    seconds, and a warning if less than min_completeness of its pixels
+    arrived or lines with its CAN ID were rejected since the last report.
+    """
+
+    def __init__(self, decoder, min_completeness=0.9, stale_timeout=1.0):
+        self.decoder = decoder
+        self.min_completeness = min_completeness
+        self.stale_timeout = stale_timeout
+        self._start(monotonic())
+
+    def _start(self, stamp):
+        self.table = self.decoder.table
+        sensors = self.table.number_sensors
+        self.frames = numpy.zeros(sensors, dtype=numpy.int64)  # Frames the sensor was part of
+        self.pixels = numpy.zeros(sensors, dtype=numpy.int64)  # Pixels received in those frames
+        self.emitted = 0
+        self.last_seen = numpy.full(sensors, numpy.nan)
+        self.reported = dict(self.decoder.parser.rejects_by_id)
+        self.since = stamp
+
+    def add(self, frame):
+        """Count an emitted frame, before any filter changes its points."""
+        if self.decoder.table is not self.table:  # The chain was reconfigured
+            self._start(frame.first_stamp)
+        filled = numpy.frombuffer(frame.filled, dtype=numpy.uint8).reshape(-1, PIXELS_PER_SENSOR)
+        pixels = filled.sum(axis=1, dtype=numpy.int64)  # Received pixels per sensor
+        seen = pixels > 0
+        self.pixels += pixels
+        self.frames += seen
+        self.emitted += 1
+        self.last_seen[seen] = frame.last_stamp
+
+    def report(self, stamp=None):
+        """Return a SensorStatus per sensor since the last report and start a new period."""
+        if stamp is None:
+            stamp = monotonic()
+        if self.decoder.table is not self.table:
+            self._start(stamp)
+        period = stamp - self.since
+        rejects_by_id = self.decoder.parser.rejects_by_id
+        statuses = []
+        for sensor in range(self.table.number_sensors):
+            canid = self.table.first_canid + sensor
+            rejected = rejects_by_id.get(canid, 0) - self.reported.get(canid, 0)
+            completeness = float(self.pixels[sensor]) / (self.emitted * PIXELS_PER_SENSOR) if self.emitted else 0.0
+            rate = self.frames[sensor] / period if period > 0 else 0.0
+            last_seen = None if numpy.isnan(self.last_seen[sensor]) else float(self.last_seen[sensor])
+            if last_seen is None:
+                level, message = ERROR, "No data"
+            elif stamp - last_seen > self.stale_timeout:
+                level, message = ERROR, "No data for {:.1f} s".format(stamp - last_seen)
+            elif self.emitted and completeness < self.min_completeness:
+                level, message = WARN, "Incomplete frames ({:.0%} of the pixels)".format(completeness)
+            elif rejected:
+                level, message = WARN, "{} rejected lines".format(rejected)
+            else:
+                level, message = OK, "OK"
+            statuses.append(SensorStatus(canid, level, message, float(rate), completeness, rejected, last_seen))
+        self.frames[:] = 0
+        self.pixels[:] = 0
+        self.emitted = 0
+        self.reported = dict(rejects_by_id)
+        self.since = stamp
+        return statuses
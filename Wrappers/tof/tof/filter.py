@@ -0,0 +1,86 @@
+"""Temporal denoising of ToF frames.
+
+TemporalFilter keeps the x (distance) of the last K frames in a ring of
+shape (K, sensors, 32) and filters every pixel of a frame with one
+vectorized operation over that ring:
+
+    median   per-pixel median of the last K frames
+    ema      exponential moving average, x = alpha * x + (1 - alpha) * previous
+    outlier  the raw sample, or NaN if it is further than threshold metres
+             from the median of the previous K frames
+
+The ring and the sort buffer of the median are allocated once, so the cost
+per frame only depends on K through the array operation. Pixels missing
+from a frame stay NaN in every mode and are ignored in the history.
+"""
+import numpy
+
+from .geometry import PIXELS_PER_SENSOR
+
+MODES = ('none', 'median', 'ema', 'outlier')
+
+
+class TemporalFilter(object):
+    """Filter the x of consecutive frames of one chain in place."""
+
+    def __init__(self, mode='none', window=5, alpha=0.5, threshold=0.1):
+        if mode not in MODES:
+            raise ValueError("Unknown filter mode '{}', expected one of {}".format(mode, ', '.join(MODES)))
+        if window < 1:
+            raise ValueError("Filter window must be at least 1, got {}".format(window))
+        self.mode = mode
+        self.window = window
+        self.alpha = alpha
+        self.threshold = threshold
+        self.ring = None  # (window, sensors, 32) x of the last frames, allocated for the first frame
+        self.sorted = None  # Sort buffer of the same shape
+        self.state = None  # EMA of every pixel
+        self.position = 0  # Ring slot of the next frame
+        self.rejected = 0  # Samples rejected as outliers
+
+    def reset(self):
+        """Forget the history, e.g. after a gap in the stream."""
+        self.ring = None
+        self.sorted = None
+        self.state = None
+        self.position = 0
+
+    def apply(self, frame):
+        """Filter the x of frame in place and return the number of samples rejected in it."""
+        if self.mode == 'none':
+            return 0
+        x = frame.points[:, 0].reshape(-1, PIXELS_PER_SENSOR)  # (sensors, 32) view, no copy
+        if self.ring is None or self.ring.shape[1:] != x.shape:  # First frame or the chain changed
+            self.ring = numpy.full((self.window,) + x.shape, numpy.nan, dtype=numpy.float32)
+            self.sorted = numpy.empty_like(self.ring)
+            self.state = numpy.full(x.shape, numpy.nan, dtype=numpy.float32)
+            self.position = 0
+        missing = numpy.isnan(x)
+        rejected = 0
+        if self.mode == 'ema':
+            average = numpy.where(numpy.isnan(self.state), x, self.alpha * x + (1.0 - self.alpha) * self.state)
+            numpy.copyto(self.state, average, where=~missing)  # Missing pixels keep their average
+            x[...] = average
+        elif self.mode == 'median':
+            self.ring[self.position] = x
+            x[...] = self._median()
+            x[missing] = numpy.nan
+        else:
+            outliers = numpy.abs(x - self._median()) > self.threshold  # False where either side is NaN
+            self.ring[self.position] = x  # Keep the raw sample so the median follows real changes
+            x[outliers] = numpy.nan
+            rejected = int(numpy.count_nonzero(outliers))
+            self.rejected += rejected
+            frame.rejected += rejected
+        self.position = (self.position + 1) % self.window
+        return rejected
+
+    def _median(self):
+        """Per-pixel median of the ring, ignoring NaN; much cheaper than numpy.nanmedian."""
+        self.sorted[...] = self.ring
+        self.sorted.sort(axis=0)  # NaN sorts last
+        valid = self.window - numpy.count_nonzero(numpy.isnan(self.ring), axis=0)
+        low = numpy.maximum(valid - 1, 0) // 2  # Pixels without any history take the NaN of slot 0
+        high = valid // 2
+        sensors, pixels = numpy.ogrid[:low.shape[0], :low.shape[1]]  # Works on the NumPy 1.11 of Kinetic
+        return 0.5 * (self.sorted[low, sensors, pixels] + self.sorted[high, sensors, pixels])
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Calibrate the floor model of the cliff detector from a recorded log.
+
+Record a few seconds of the chain on flat floor with the record tool, the
+robot standing or driving slowly, and compute the floor distance of every
+pixel from it:
+
+    $ tof-record floor.toflog --port /dev/ttyUSB1
+    $ tof-floor floor.toflog floor.npy --first-canid 16 --last-canid 20
+    $ ros2 run pointcloud pointcloud --ros-args -p cliff_floors:="['floor.npy']"
+"""
+import argparse
+import sys
+
+import numpy
+
+from tof.cliff import calibrate, save_floor
+from tof.decoder import Decoder, First_CANID, Last_CANID, PROTOCOLS, decode_log
+from tof.geometry import PIXELS_PER_SENSOR
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('output', help='floor model file (.npy)')
+    parser.add_argument('--first-canid', type=int, default=First_CANID)
+    parser.add_argument('--last-canid', type=int, default=Last_CANID)
+    parser.add_argument('--min-valid', type=float, default=0.5,
+                        help='share of the frames a pixel needs a distance in to be part of the floor')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='ascii', help='format of a byte log')
+    args = parser.parse_args(args)
+
+    try:
+        decoder = Decoder(args.first_canid, args.last_canid, timeout=0, protocol=args.protocol)
+        distances = [frame.points[:, 0].copy() for frame in decode_log(args.log, decoder)]
+        if not distances:
+            sys.exit(f"floor: no frames of CAN ID {args.first_canid} to {args.last_canid} in {args.log}")
+        floor = calibrate(numpy.stack(distances), args.min_valid)
+        save_floor(args.output, floor)
+    except (OSError, ValueError) as e:
+        sys.exit(f"floor: {e}")
+    for sensor, pixels in enumerate(floor.reshape(-1, PIXELS_PER_SENSOR)):
+        seen = pixels[~numpy.isnan(pixels)]
+        summary = f"{len(seen)} floor pixels, {seen.min():.3f} to {seen.max():.3f} m" if len(seen) else "no floor pixels"
+        print(f"CAN ID {args.first_canid + sensor}: {summary}")
+    print(f"{len(distances)} frames, floor model written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Pixel-addressed assembly of ToF frames.
+
+Every sample is written to the row of its (CAN ID, pixel) in a
+preallocated float32 (N, 3) array, whose memory layout is exactly the
+x, y, z FLOAT32 layout of the published PointCloud2. A bitmap tracks which
+pixels of the frame are filled, so a dropped or repeated line only affects
+the pixel it belongs to instead of shifting every later frame.
+
+The lines of the sensors of a chain may interleave in any way, but each
+sensor is assumed to send its own pixels in increasing row, column order.
+The assembler keeps the last pixel of every sensor, also across frames, so
+a sample repeating it is a duplicate even right after its frame completed.
+A frame is emitted when all of its pixels are filled, when a sensor whose
+pixels it already holds wraps to a lower pixel than its previous sample
+(that sensor has started the next scan), or when it is older than the
+timeout. A pixel already in the frame is at or below its sensor's previous
+pixel, so it always starts the next frame unless it repeats that previous
+pixel. A repeated line thus tears at most the scan it is in, and the
+following frames start at the scan start again instead of mixing two scans.
+After a timeout, samples continuing a sensor's timed out scan are counted
+as late until that sensor's pixel wraps.
+Pixels missing from an emitted frame have a NaN x.
+"""
+import copy
+
+import numpy
+
+from .geometry import DISTANCE_SCALE, PIXELS_PER_SENSOR
+
+try:
+    from time import monotonic
+except ImportError:  # Python 2
+    from time import time as monotonic
+
+POINT_STEP = 12  # Bytes of one x, y, z float32 point
+
+
+class Frame(object):
+    """Points and fill bitmap of one frame."""
+
+    def __init__(self, table):
+        size = len(table)
+        self.points = numpy.empty((size, 3), dtype=numpy.float32)
+        self.points[:, 1:] = table.offsets  # y, z never change, only x is written per sample
+        self.filled = bytearray(size)
+        self._empty = bytearray(size)
+        self.reset()
+
+    def __len__(self):
+        return len(self.filled)
+
+    def reset(self):
+        self.points[:, 0] = numpy.nan
+        self.filled[:] = self._empty
+        self.count = 0  # Number of filled pixels
+        self.first_stamp = None  # Receive time of the first and last sample
+        self.last_stamp = None
+        self.timed_out = False
+        self.sequence = None  # Number of the frame, set when it is emitted
+        self.rejected = 0  # Samples set to NaN by a filter
+
+    def copy(self):
+        """Return a copy that stays valid after the assembler reuses this frame."""
+        frame = copy.copy(self)
+        frame.points = self.points.copy()
+        frame.filled = bytearray(self.filled)
+        return frame
+
+    @property
+    def complete(self):
+        return self.count == len(self.filled)
+
+    @property
+    def dense(self):
+        """True if every point has a distance."""
+        return self.complete and not self.rejected
+
+
+class FrameAssembler(object):
+    """Assemble samples into frames keyed by their pixel index.
+
+    Two frames are used alternately, so an emitted frame stays valid until
+    the next one is emitted. Counters:
+        frames      emitted frames
+        torn        emitted frames with missing pixels
+        timeouts    frames emitted because they were older than the timeout
+        duplicates  samples repeating the previous pixel of their sensor, ignored
+        late        pixels of a timed out frame arriving after it was emitted, ignored
+    """
+
+    def __init__(self, table, timeout=0.5):
+        self.timeout = timeout
+        self.current = Frame(table)
+        self.spare = Frame(table)
+        self.sensors = len(table) // PIXELS_PER_SENSOR
+        self.last_pixel = [-1] * self.sensors  # Last pixel of every sensor, kept across frames
+        self.in_frame = [False] * self.sensors  # Sensors with pixels in the current frame
+        self.late_after = None  # Last pixel of every sensor in the last timed out frame
+        self.frames = 0
+        self.torn = 0
+        self.timeouts = 0
+        self.duplicates = 0
+        self.late = 0
+
+    def add(self, index, distance, stamp=None):
+        """Add the distance of one pixel, return the Frame this completed or tore, or None."""
+        if stamp is None:
+            stamp = monotonic()
+        done = self.poll(stamp)
+        frame = self.current
+        sensor, pixel = divmod(index, PIXELS_PER_SENSOR)
+        late_after = self.late_after
+        if late_after is not None and late_after[sensor] >= 0:
+            if pixel >= late_after[sensor]:  # Straggler of the frame that just timed out
+                self.late += 1
+                late_after[sensor] = pixel
+                return done
+            late_after[sensor] = -1  # The sensor's pixel wrapped, this is its next scan
+        last = self.last_pixel[sensor]
+        if pixel == last:
+            self.duplicates += 1
+            return done
+        if pixel < last and self.in_frame[sensor]:  # The sensor has started the next scan
+            done = self._emit()
+            frame = self.current
+        frame.points[index, 0] = DISTANCE_SCALE * distance
+        frame.filled[index] = 1
+        frame.count += 1
+        if frame.first_stamp is None:
+            frame.first_stamp = stamp
+        frame.last_stamp = stamp
+        self.last_pixel[sensor] = pixel
+        self.in_frame[sensor] = True
+        if frame.count == len(frame.filled):
+            done = self._emit()
+        return done
+
+    def poll(self, stamp=None):
+        """Emit the current frame if it is older than the timeout."""
+        frame = self.current
+        if not frame.count or self.timeout <= 0:
+            return None
+        if stamp is None:
+            stamp = monotonic()
+        if stamp - frame.first_stamp < self.timeout:
+            return None
+        frame.timed_out = True
+        self.timeouts += 1
+        self.late_after = [last if seen else -1 for last, seen in zip(self.last_pixel, self.in_frame)]
+        return self._emit()
+
+    def flush(self):
+        """Emit the current frame regardless of its age, e.g. at the end of a stream."""
+        if not self.current.count:
+            return None
+        return self._emit()
+
+    def _emit(self):
+        frame = self.current
+        self.frames += 1
+        frame.sequence = self.frames
+        if not frame.complete:
+            self.torn += 1
+        self.spare.reset()
+        self.current, self.spare = self.spare, frame
+        self.in_frame = [False] * self.sensors
+        return frame
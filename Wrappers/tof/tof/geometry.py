@@ -0,0 +1,46 @@
+"""Pixel geometry of a daisy chain of AFBR-S50 ToF sensors.
+
+Only the x coordinate of a point depends on the measured distance, the
+(y, z) position of every pixel is fixed by its CAN ID, row and column.
+CoordinateTable computes those offsets once so that converting a sample
+into a point is a single table lookup plus a distance scale.
+"""
+
+PIXEL_ROWS = 4  # Pixel rows of one sensor
+PIXEL_COLS = 8  # Pixel columns of one sensor
+PIXELS_PER_SENSOR = PIXEL_ROWS * PIXEL_COLS
+DISTANCE_SCALE = 0.001  # Distances are reported in millimetres
+
+
+class CoordinateTable(object):
+    """Lookup table of the (y, z) offset of every pixel in the chain."""
+
+    def __init__(self, first_canid, last_canid):
+        if last_canid < first_canid:
+            raise ValueError("last_canid ({}) is smaller than first_canid ({})".format(last_canid, first_canid))
+        self.first_canid = first_canid
+        self.last_canid = last_canid
+        self.number_sensors = last_canid - first_canid + 1
+        center = (last_canid + first_canid) / 2.0  # The chain is centered on the y axis
+        self.offsets = []  # (y, z) per pixel, indexed by index()
+        for device_id in range(first_canid, last_canid + 1):
+            for row in range(PIXEL_ROWS):
+                for col in range(PIXEL_COLS):
+                    y = 0.01 * col + 0.08 * (device_id - center - 0.5)
+                    z = 0.02 * (5 - row) + 0.08
+                    self.offsets.append((y, z))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def matches(self, first_canid, last_canid):
+        """Check whether the table was built for the given chain."""
+        return self.first_canid == first_canid and self.last_canid == last_canid
+
+    def index(self, device_id, row, col):
+        """Return the flat pixel index, or -1 if the pixel is not part of the chain."""
+        if not (self.first_canid <= device_id <= self.last_canid):
+            return -1
+        if not (0 <= row < PIXEL_ROWS and 0 <= col < PIXEL_COLS):
+            return -1
+        return (device_id - self.first_canid) * PIXELS_PER_SENSOR + row * PIXEL_COLS + col
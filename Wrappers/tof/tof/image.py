@@ -0,0 +1,40 @@
+"""Depth image of a ToF frame.
+
+The pixels of a chain are a 4 x 8 range grid per sensor. DepthImage lays
+the grids of the sensors side by side, in CAN ID order, into one 16 bit
+image of the distance in millimetres, the 16UC1 encoding of
+sensor_msgs/Image. Pixels without a distance are 0. The image is one
+sixth of the x, y, z float32 cloud and is filled from the x of the frame
+with a few array operations into a preallocated buffer.
+"""
+import numpy
+
+from .geometry import DISTANCE_SCALE, PIXEL_COLS, PIXEL_ROWS, PIXELS_PER_SENSOR
+
+
+class DepthImage(object):
+    """Tile the frames of a chain of size pixels into a (4, 8 * sensors) uint16 image."""
+
+    def __init__(self, size):
+        self.sensors = size // PIXELS_PER_SENSOR
+        self.pixels = numpy.zeros((PIXEL_ROWS, PIXEL_COLS * self.sensors), dtype=numpy.uint16)
+        self._millimetres = numpy.empty((self.sensors, PIXEL_ROWS, PIXEL_COLS), dtype=numpy.float32)
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    def fill(self, points):
+        """Return the image of the (N, 3) points, a buffer overwritten by the next call."""
+        millimetres = self._millimetres
+        numpy.divide(points[:, 0].reshape(millimetres.shape), DISTANCE_SCALE, out=millimetres)
+        numpy.rint(millimetres, out=millimetres)
+        numpy.clip(millimetres, 0, 65535, out=millimetres)
+        millimetres[numpy.isnan(millimetres)] = 0  # No distance
+        tiles = self.pixels.reshape(PIXEL_ROWS, self.sensors, PIXEL_COLS)  # A view, row by sensor by column
+        tiles[...] = millimetres.transpose(1, 0, 2)
+        return self.pixels
@@ -0,0 +1,90 @@
+"""Parser for the ``ID:RC DIST`` lines printed by the sensor chain.
+
+A line such as ``16:03 1234`` carries the CAN ID of the sensor, the row and
+column digit of the pixel and the measured distance in millimetres. Well
+formed lines are matched by a single precompiled pattern; only lines that
+do not match take the slow path, which accepts the same stray characters as
+the original parser and classifies why a line is rejected. Rejects are
+counted instead of being logged or raised, so a noisy bus costs no more
+than a clean one. Rejected lines whose CAN ID could still be read are also
+counted per CAN ID of the chain, to tell a failing sensor from a noisy bus;
+IDs outside the chain share one OTHER_IDS count, so garbled IDs cannot grow
+the counters without bound.
+"""
+import re
+
+MALFORMED = 'malformed'  # No ID:data separator or no distance field
+BAD_ID = 'bad_id'  # No digits in the CAN ID
+SHORT_COORDS = 'short_coords'  # Less than two coordinate digits
+BAD_DISTANCE = 'bad_distance'  # No digits in the distance
+UNKNOWN_PIXEL = 'unknown_pixel'  # Pixel is not part of the configured chain
+REJECT_REASONS = (MALFORMED, BAD_ID, SHORT_COORDS, BAD_DISTANCE, UNKNOWN_PIXEL)
+OTHER_IDS = 'other'  # Key of rejects_by_id for the CAN IDs outside the chain
+
+_LINE = re.compile(r'[^\d:]*(\d+):(\d)(\d)\d* (\d+)\r?$')
+_LINE_BYTES = re.compile(br'[^\d:]*(\d+):(\d)(\d)\d* (\d+)\r?$')  # Same pattern for lines read from the port
+_NON_DIGITS = re.compile(r'\D')
+
+
+class LineParser(object):
+    """Parse raw ToF lines into (device_id, row, col, distance) tuples."""
+
+    def __init__(self, first_canid=None, last_canid=None):
+        self.lines = 0
+        self.rejects = dict((reason, 0) for reason in REJECT_REASONS)
+        self.rejects_by_id = {}  # Rejected lines per CAN ID of the chain, for the lines that have one
+        self.set_chain(first_canid, last_canid)
+
+    def set_chain(self, first_canid, last_canid):
+        """Count rejects per CAN ID only from first_canid to last_canid, None for no limit."""
+        self.first_canid = first_canid
+        self.last_canid = last_canid
+
+    def parse(self, line):
+        """Return (device_id, row, col, distance), or None if the line is rejected.
+
+        The line may be text or the raw bytes read from the serial port.
+        """
+        self.lines += 1
+        if isinstance(line, bytes):
+            match = _LINE_BYTES.match(line)
+        else:
+            match = _LINE.match(line)
+        if match is not None:
+            device_id, row, col, distance = match.groups()
+            return int(device_id), int(row), int(col), int(distance)
+        if not isinstance(line, str):
+            line = line.decode('ascii', 'replace')
+        return self._parse_slow(line)
+
+    def _parse_slow(self, line):
+        parts = line.split(':')
+        if len(parts) < 2:
+            return self.reject(MALFORMED)
+        device_id = _NON_DIGITS.sub('', parts[0])
+        if not device_id:
+            return self.reject(BAD_ID)
+        device_id = int(device_id)
+        data_parts = parts[1].split(' ')
+        if len(data_parts) < 2:
+            return self.reject(MALFORMED, device_id)
+        coords = _NON_DIGITS.sub('', data_parts[0])
+        if len(coords) < 2:
+            return self.reject(SHORT_COORDS, device_id)
+        distance = _NON_DIGITS.sub('', data_parts[1])
+        if not distance:
+            return self.reject(BAD_DISTANCE, device_id)
+        return device_id, int(coords[0]), int(coords[1]), int(distance)
+
+    def reject(self, reason, device_id=None):
+        """Count a rejected line, of device_id if known, and return None."""
+        self.rejects[reason] += 1
+        if device_id is not None:
+            if self.first_canid is not None and not self.first_canid <= device_id <= self.last_canid:
+                device_id = OTHER_IDS
+            self.rejects_by_id[device_id] = self.rejects_by_id.get(device_id, 0) + 1
+        return None
+
+    def rejected(self):
+        """Return the total number of rejected lines."""
+        return sum(self.rejects.values())
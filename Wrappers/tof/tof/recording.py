@@ -0,0 +1,119 @@
+"""Append-only binary log of a raw ToF stream.
+
+A log starts with an 8 byte header, MAGIC, the format version and the kind
+of payload, followed by records of a little-endian uint64 receive time in
+nanoseconds of the monotonic clock, a uint32 payload length and the
+payload. KIND_BYTES payloads are chunks as they were read from the serial
+port, KIND_LINES payloads are single lines without their newline.
+
+Records are only ever appended and read one at a time, so a capture can run
+for hours and be replayed without holding it in memory. A capture that was
+cut off loses at most its last record. Appending to such a log first
+truncates it after its last complete record, so the new records stay
+readable.
+"""
+import os
+import struct
+import time
+
+MAGIC = b'TOFLOG'
+VERSION = 1
+KIND_BYTES = 0  # Raw serial chunks
+KIND_LINES = 1  # Lines as published on raw_tof
+KINDS = {'bytes': KIND_BYTES, 'lines': KIND_LINES}
+
+_HEADER = struct.Struct('<6sBB')  # Magic, version, kind
+_RECORD = struct.Struct('<QI')  # Receive time in ns, payload length
+
+
+def _read_header(file, path):
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("{} is not a raw ToF log: too short".format(path))
+    magic, version, kind = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("{} is not a raw ToF log".format(path))
+    if version != VERSION:
+        raise ValueError("{} has unsupported log version {}".format(path, version))
+    if kind not in KINDS.values():
+        raise ValueError("{} has unknown payload kind {}".format(path, kind))
+    return kind
+
+
+def _end_of_records(file):
+    """Return the offset after the last complete record of a log positioned after its header."""
+    size = os.fstat(file.fileno()).st_size
+    position = _HEADER.size
+    while True:
+        file.seek(position)
+        head = file.read(_RECORD.size)
+        if len(head) < _RECORD.size:
+            return position
+        _, length = _RECORD.unpack(head)
+        end = position + _RECORD.size + length
+        if end > size:
+            return position  # The capture was cut off while writing this record
+        position = end
+
+
+class LogWriter(object):
+    """Append timestamped records to a log, creating it if needed."""
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+        self.records = 0
+        self.file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        try:
+            if os.fstat(self.file.fileno()).st_size == 0:
+                self.file.write(_HEADER.pack(MAGIC, VERSION, kind))
+            else:
+                if _read_header(self.file, path) != kind:
+                    raise ValueError("{} holds a different payload kind".format(path))
+                self.file.truncate(_end_of_records(self.file))  # Drop a record that was cut off
+                self.file.seek(0, os.SEEK_END)
+        except Exception:
+            self.file.close()
+            raise
+
+    def write(self, payload, stamp=None):
+        """Append one payload, received at stamp ns of the monotonic clock (default: now)."""
+        if stamp is None:
+            stamp = time.monotonic_ns()
+        self.file.write(_RECORD.pack(stamp, len(payload)))
+        self.file.write(payload)
+        self.records += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LogReader(object):
+    """Iterate over the (stamp, payload) records of a log, one record at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.kind = _read_header(file, path)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as file:
+            file.seek(_HEADER.size)
+            while True:
+                head = file.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return
+                stamp, length = _RECORD.unpack(head)
+                payload = file.read(length)
+                if len(payload) < length:
+                    return  # The capture was cut off while writing this record
+                yield stamp, payload